@@ -1,12 +1,24 @@
 import os
-import re
 import time
 import sys
+import json
+from collections import namedtuple
 from datetime import datetime
-from watchdog.events import FileSystemEventHandler
-from watchdog.observers import Observer
-import pythoncom
-import win32com.client
+from importlib.util import find_spec
+from doc_no import extract_doc_no, normalize_doc_no
+from event_batcher import DeferBatch, EventBatcher
+from event_filter import DEDUP_WINDOW, EventFilter
+from event_journal import JOURNAL_PREFIX, EventJournal, journal_path
+from metrics import METRICS_PREFIX, Metrics, MetricsWriter
+from reconcile import arrival_order, reconcile, scan_tree
+import routing
+from routing import RoutingTable
+from rules import RULES_FILENAME, RulesFile
+from sheet_io import RowWriter, SheetSnapshot
+from sheet_state import SelfIdCounters, SheetState, WorkbookStateCache
+from stability import StabilityScheduler
+# watchdog 与工作簿后端（pywin32 / xlrd、xlwt）在第一次用到时才导入：
+# 路由、文号、行分配等纯逻辑在 routing.py / doc_no.py / sheet_state.py 中，可单独导入
 
 # Determine the directory to watch:
 if getattr(sys, 'frozen', False):
@@ -14,50 +26,109 @@ if getattr(sys, 'frozen', False):
 else:
     WATCH_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# 失败后的首次重试间隔（秒，之后按指数退避）与最多尝试次数；被锁定不计次数
 RETRY_DELAY = 1
 RETRIES = 8
 
-CATEGORY_PREFIX_MAP = {
-    "上级文": "SJW",
-    "其他": "QT",
-    "事项通知": "SXTZ",
-}
+# 启动时补登监控停止期间新增的文件（见 reconcile.py）；暂停后恢复监控时同样补登：
+# 收文目录未被修改且已有索引时不打开工作簿，为补登打开的收文目录随即释放
+RECONCILE_ON_STARTUP = True
+# 暂停前等待已排队事件写入收文目录的最长时间（秒）；超时未写入的事件留在事件日志中
+DRAIN_TIMEOUT = 30
+# 新文件的大小与修改时间保持不变多久才登记（秒），大文件复制完成之前不处理（见 stability.py）
+STABLE_SECONDS = 1.0
+# 文件被删除时写入该行备注列的文字；文件重新出现时清空
+DELETED_NOTE = "文件已删除"
+# 整个目录树的事件：新建（复制/拖入）的目录、移动或改名的目录；path 为目录，src 为移动前的目录
+TREE_KINDS = ("tree_created", "tree_moved")
+
+# 批处理中的一个事件：kind 为 created / moved / deleted、TREE_KINDS、tree_deleted（path 为已删除的目录）
+# 或 reconcile（补登：尚未登记时才新增，不写事件日志），
+# src 为改名前的路径（仅移动），
+# received 为监控收到事件的时间（time.monotonic()，重放的事件为 None），用于统计各阶段耗时
+FileEvent = namedtuple("FileEvent", "entry_id path kind src received", defaults=(None,))
+
+# 工作簿后端：com = 常驻 Excel 实例（需 pywin32，见 workbook_host.py），
+# xls = 用 xlrd/xlwt 直接读写 .xls（见 xls_backend.py），auto = 有 pywin32 时用 com
+WORKBOOK_BACKEND = os.environ.get("AUTOHYPERLINK_BACKEND", "auto").lower()
+
+# 设置后把启动各阶段的时间点（time.time()）按 JSON 行追加到该文件，见 bench_startup.py
+STARTUP_LOG = os.environ.get("AUTOHYPERLINK_STARTUP_LOG")
+
+# 各阶段计数与耗时每隔多少秒写到 exe 旁的 .autohyperlink_metrics.jsonl / .prom（见 metrics.py），0 表示不写
+METRICS_INTERVAL = float(os.environ.get("AUTOHYPERLINK_METRICS_INTERVAL", "60"))
+
+# 整个监控会话共用一个工作簿宿主（HostPool：每个收文目录一个线程/Excel 实例）
+_HOST = None
+# 各收文目录的工作表快照与行索引，跨批次复用（见 sheet_state.py）
+_STATE = WorkbookStateCache()
+# 目录 -> (收文目录, 工作表, 自编号前缀, 年份) 路由表，启动时按目录树建立（见 routing.py）
+_ROUTES = None
+# 已接收但尚未保存进收文目录的事件，崩溃或被结束后下次启动重放（见 event_journal.py）
+_JOURNAL = None
+# 计数器与各阶段耗时直方图：Excel 启动、打开、读表、写入、保存，以及事件从收到/修改到保存
+_METRICS = Metrics()
+
+# 分类前缀、年份目录、忽略列表、收文目录文件名等规则放在 exe 旁的
+# autohyperlink_rules.json 中，修改后自动重新加载（见 rules.py）
+_RULES = None
+
+# 已记录的启动阶段，每个阶段只记录第一次
+_STARTUP_MARKED = set()
+
+def _startup_mark(stage):
+    if not STARTUP_LOG or stage in _STARTUP_MARKED:
+        return
+    _STARTUP_MARKED.add(stage)
+    record = {
+        "stage": stage,
+        "time": time.time(),
+        "pid": os.getpid(),
+        "mode": "frozen" if getattr(sys, "frozen", False) else "script",
+    }
+    try:
+        with open(STARTUP_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError:
+        pass
+
+def _rules():
+    global _RULES
+    path = os.path.join(WATCH_DIR, RULES_FILENAME)
+    if _RULES is None or _RULES.path != path:
+        _RULES = RulesFile(path)
+    return _RULES.current()
+
+def _routes():
+    global _ROUTES
+    rules = _rules()
+    if _ROUTES is None or _ROUTES.root != os.path.abspath(WATCH_DIR) or _ROUTES.rules is not rules:
+        # 规则变化后重建路由表
+        fresh = _ROUTES is not None and _ROUTES.root == os.path.abspath(WATCH_DIR)
+        _ROUTES = RoutingTable(WATCH_DIR, rules)
+        if fresh:
+            _ROUTES.build()
+    return _ROUTES
 
 def _find_year_two_digits(path):
-    parts = os.path.normpath(path).split(os.sep)
-    for part in parts:
-        if part in ("25", "26"):
-            return part
-    return None
+    route = _routes().route_file(path)
+    return route.year if route else None
 
 def _category_label_from_path(path):
+    route = _routes().route_file(path)
+    if route:
+        return route.sheet
     rel = os.path.relpath(path, WATCH_DIR)
     parts = rel.split(os.sep)
     if len(parts) < 2:
         return None
-    folder = parts[0]
-    label = re.sub(r"^\s*\d+\s*[-－]\s*", "", folder).strip()
-    return label or folder
+    return routing.category_label(parts[0])
 
 def _extract_doc_no(text):
-    stem = os.path.splitext(text)[0]
-    patterns = [
-        r"([^\s（）()]*?[〔【]\s*20\d{2}\s*[〕】]\s*\d+\s*号)",
-        r"([^\s（）()]*?\[\s*20\d{2}\s*\]\s*\d+\s*号)",
-    ]
-    for pat in patterns:
-        m = re.search(pat, stem)
-        if m:
-            return re.sub(r"\s+", "", m.group(1)).strip()
-    m = re.search(r"[（(]([^）)]+号)[)）]", stem)
-    if m:
-        inner = m.group(1).strip()
-        if re.search(r"20\d{2}", inner):
-            return re.sub(r"\s+", "", inner).strip()
-    return ""
+    return extract_doc_no(text)
 
 def _normalize_doc_no(v):
-    return re.sub(r"\s+", "", str(v or "")).strip()
+    return normalize_doc_no(v)
 
 def _find_sheet_index_com(wb, category_label):
     if not category_label:
@@ -78,23 +149,17 @@ def _find_sheet_index_com(wb, category_label):
     return None
 
 def _find_header_map_com(ws):
-    # Scan first 50 rows for header
+    # Scan first 50 rows for header（传入工作表时只读取 A1:S50 一个区域）
     max_rows = 50
-    used_rows = ws.UsedRange.Rows.Count
-    limit = min(max_rows, used_rows)
+    snap = ws if isinstance(ws, SheetSnapshot) else SheetSnapshot.read_block(ws, max_rows, 19)
+    limit = min(max_rows, snap.last_row)
     
     header_row = -1
     hm = {}
     
-    # Iterate rows (1-based)
+    # Iterate rows (1-based), first 19 columns to find "序号" and "文件名"
     for r in range(1, limit + 1):
-        # Read entire row efficiently? 
-        # For simplicity, read specific cells or UsedRange intersection
-        # Let's just read the first 20 columns to find "序号" and "文件名"
-        row_vals = []
-        for c in range(1, 20):
-            val = str(ws.Cells(r, c).Value or "").strip()
-            row_vals.append(val)
+        row_vals = [snap.text(r, c) for c in range(1, 20)]
         
         if "序号" in row_vals and "文件名" in row_vals:
             header_row = r
@@ -108,9 +173,9 @@ def _find_header_map_com(ws):
     return header_row, hm
 
 def _find_existing_row_com(ws, header_row, hm, doc_no, rel_path, filename):
-    # Scan from header_row + 1 to end
-    last_row = ws.UsedRange.Rows.Count + ws.UsedRange.Row - 1
-    # If UsedRange is unreliable, we might need to be careful, but usually it's fine for reading.
+    # Scan from header_row + 1 to end of the snapshot (one UsedRange read)
+    snap = SheetSnapshot.of(ws)
+    last_row = snap.last_row
     
     target_doc_no = _normalize_doc_no(doc_no)
     
@@ -119,22 +184,15 @@ def _find_existing_row_com(ws, header_row, hm, doc_no, rel_path, filename):
     
     if not file_col: return None
     
-    # To optimize, we could read the whole range into a list of lists, but for now loop is safer for COM logic simplicity
-    # Reading huge sheets cell-by-cell is slow via COM. 
-    # Optimization: Read the column into a variant array.
-    
-    # However, for simplicity and robustness in this script, simple iteration is okay if rows < 1000.
-    # Let's try to be slightly efficient.
-    
     for r in range(header_row + 1, last_row + 2): # Go a bit beyond
         # Check Doc No
         if doc_col and target_doc_no:
-            val = str(ws.Cells(r, doc_col).Value or "").strip()
+            val = snap.text(r, doc_col)
             if _normalize_doc_no(val) == target_doc_no:
                 return r
         
         # Check Filename/Path
-        val_file = str(ws.Cells(r, file_col).Value or "").strip()
+        val_file = snap.text(r, file_col)
         if not val_file:
             continue # Skip empty file cells? Or is it end of data?
             # Don't stop, there might be gaps.
@@ -147,9 +205,9 @@ def _find_existing_row_com(ws, header_row, hm, doc_no, rel_path, filename):
     return None
 
 def _is_row_empty_com(ws, r, content_cols):
+    snap = SheetSnapshot.of(ws)
     for c in content_cols:
-        val = str(ws.Cells(r, c).Value or "").strip()
-        if val:
+        if snap.text(r, c):
             return False
     return True
 
@@ -158,19 +216,21 @@ def _find_first_empty_row_com(ws, header_row, hm):
     if not content_cols:
         return header_row + 1
         
-    last_row = ws.UsedRange.Rows.Count + ws.UsedRange.Row - 1
+    snap = SheetSnapshot.of(ws)
+    last_row = snap.last_row
     
     for r in range(header_row + 1, last_row + 2):
-        if _is_row_empty_com(ws, r, content_cols):
+        if _is_row_empty_com(snap, r, content_cols):
             return r
     return last_row + 1
 
 def _next_seq_com(ws, header_row, hm, target_row):
     seq_col = hm.get("序号")
     if not seq_col: return 1
+    snap = SheetSnapshot.of(ws)
     
     # 1. 如果当前行已有序号，直接沿用（不覆盖）
-    current_val = str(ws.Cells(target_row, seq_col).Value or "").strip()
+    current_val = snap.text(target_row, seq_col)
     if current_val:
         # 尝试转为数字，如果无法转换则原样返回
         try:
@@ -181,7 +241,7 @@ def _next_seq_com(ws, header_row, hm, target_row):
     # 2. 如果没有序号，则向上回溯寻找最近的一个有效序号
     # 从 target_row - 1 向上遍历到 header_row + 1
     for r in range(target_row - 1, header_row, -1):
-        val = str(ws.Cells(r, seq_col).Value or "").strip()
+        val = snap.text(r, seq_col)
         if val:
             try:
                 v = int(float(val))
@@ -192,251 +252,928 @@ def _next_seq_com(ws, header_row, hm, target_row):
     # 如果一直回溯到表头都没找到有效序号，说明这是第一条数据
     return 1
 
-def _wait_for_file_unlock(filepath, timeout=3):
-    """尝试等待文件解锁"""
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        try:
-            # 尝试以追加模式打开文件，如果成功说明未被锁定
-            with open(filepath, 'a+'):
-                pass
-            return True
-        except PermissionError:
-            time.sleep(0.5)
-        except Exception:
-            # 其他错误（如文件不存在）暂不处理，交给后续逻辑
-            return True
-    return False
+def _is_file_locked(filepath):
+    """只试一次，不等待：文件被其他程序（如同事打开的 Excel）占用时返回 True"""
+    if not os.path.exists(filepath):
+        return False
+    try:
+        with open(filepath, 'a+'):
+            pass
+        return False
+    except PermissionError:
+        return True
+    except Exception:
+        return False
 
 def _infer_date_format_com(ws, header_row, date_col):
     if not date_col: return "dot"
-    last_row = ws.UsedRange.Rows.Count + ws.UsedRange.Row - 1
-    for r in range(last_row, header_row, -1):
-        val = str(ws.Cells(r, date_col).Value or "").strip()
+    snap = SheetSnapshot.of(ws)
+    for r in range(snap.last_row, header_row, -1):
+        val = snap.text(r, date_col)
         if val:
             if "/" in val: return "slash"
             if "." in val: return "dot"
     return "dot"
 
+def _prefix_for_category(category_label):
+    return _rules().prefix_for(category_label)
+
 def _generate_self_id_com(ws, header_row, self_col, year_full, category_label):
-    prefix = CATEGORY_PREFIX_MAP.get(category_label, "QT")
+    prefix = _prefix_for_category(category_label)
     if not self_col: return f"{prefix}-{year_full}-1"
-    
-    max_num = 0
-    pattern = re.compile(rf"^{re.escape(prefix)}-{year_full}-(\d+)$")
-    
-    last_row = ws.UsedRange.Rows.Count + ws.UsedRange.Row - 1
-    for r in range(header_row + 1, last_row + 1):
-        val = str(ws.Cells(r, self_col).Value or "").strip()
-        m = pattern.match(val)
-        if m:
-            try:
-                num = int(m.group(1))
-                max_num = max(max_num, num)
-            except:
-                pass
-    return f"{prefix}-{year_full}-{max_num + 1}"
+    counters = SelfIdCounters.build(SheetSnapshot.of(ws), header_row, self_col)
+    return counters.next(prefix, year_full)
 
 def _infer_last_nonempty_com(ws, header_row, col):
-    last_row = ws.UsedRange.Rows.Count + ws.UsedRange.Row - 1
-    for r in range(last_row, header_row, -1):
-        val = str(ws.Cells(r, col).Value or "").strip()
+    snap = SheetSnapshot.of(ws)
+    for r in range(snap.last_row, header_row, -1):
+        val = snap.text(r, col)
         if val:
             return val
     return ""
 
+def _backend_name():
+    if WORKBOOK_BACKEND != "auto":
+        return WORKBOOK_BACKEND
+    # 只检查是否安装，不加载 COM
+    return "com" if find_spec("win32com") is not None else "xls"
+
+def _get_host():
+    global _HOST
+    if _HOST is None:
+        from workbook_host import ExcelWorkbookHost, HostPool
+        from xls_backend import XlsWorkbookHost
+        if _backend_name() == "xls":
+            _HOST = HostPool(lambda excel_path: XlsWorkbookHost(metrics=_METRICS))
+        else:
+            _HOST = HostPool(lambda excel_path: ExcelWorkbookHost(metrics=_METRICS))
+    return _HOST
+
+def _close_host():
+    # 保存并关闭常驻 Excel，释放收文目录（供退出及验证脚本使用）
+    global _HOST
+    if _HOST is not None:
+        _HOST.close()
+        _HOST = None
+
 def _update_workbook(excel_path, file_path):
-    # COM Implementation
-    
-    # 1. 检查文件锁定状态，给予一定的缓冲时间让之前的进程释放
-    if not _wait_for_file_unlock(excel_path, timeout=5):
-        print(f"文件仍被锁定，跳过本次更新: {excel_path}")
-        return
+    _update_workbook_batch(excel_path, [file_path])
+
+def _update_workbook_batch(excel_path, file_paths):
+    results = _update_workbook_events(excel_path, [FileEvent(None, p, "created", None) for p in file_paths])
+    return [(file_path, target_row) for _, file_path, target_row in results]
+
+def _path_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+def _collapse_renamed_then_deleted(events):
+    # 改名 A -> B、随后 B 又被删除：Excel 保存时经过临时名的改名两者都作废，原行不动；
+    # 其他改名合并为在改名的位置删除 A（之后再改回 A 的事件仍排在它后面）
+    moved_to = {}  # 路径 -> 改名事件的位置
+    replaced = {}  # 位置 -> 替换的事件，None 为作废
+    for i, event in enumerate(events):
+        key = _path_key(event.path)
+        if event.kind == "deleted" and key in moved_to:
+            j = moved_to.pop(key)
+            renamed = events[j]
+            replaced[i] = None
+            replaced[j] = None if _is_save_rename(renamed) else (
+                FileEvent(renamed.entry_id, renamed.src, "deleted", None, renamed.received)
+            )
+            continue
+        moved_to.pop(key, None)
+        if event.kind == "moved" and event.src is not None:
+            moved_to.pop(_path_key(event.src), None)
+            moved_to[key] = i
+    events = [replaced.get(i, event) for i, event in enumerate(events)]
+    return [event for event in events if event is not None]
+
+def _update_workbook_events(excel_path, events):
+    events = _collapse_renamed_then_deleted(events)
+    if not events:
+        return []
+    host = _get_host()
+
+    # 1. 检查文件锁定状态：被占用时不等待，交给批处理器推迟重试（指数退避）
+    #    （已由本进程的 Excel 打开时，锁是我们自己持有的）
+    if not host.is_open(excel_path):
+        with _METRICS.timer("lock_check"):
+            locked = _is_file_locked(excel_path)
+        if locked:
+            raise DeferBatch(f"文件被锁定: {excel_path}")
 
     try:
-        pythoncom.CoInitialize()
-    except:
-        pass
-        
-    app = None
-    wb = None
-    try:
-        try:
-            app = win32com.client.DispatchEx("Excel.Application")
-        except Exception as e:
-            # Fallback to standard Dispatch if Ex fails
-            app = win32com.client.Dispatch("Excel.Application")
-            
-        app.Visible = False
-        app.DisplayAlerts = False
-        
-        # Check if workbook is already open?
-        # DispatchEx creates a new instance usually.
-        
-        try:
-            wb = app.Workbooks.Open(excel_path, UpdateLinks=0, ReadOnly=False)
-        except Exception as e:
-            print(f"Failed to open workbook: {e}")
-            return
+        with _METRICS.timer("session"):
+            results = host.run(excel_path, lambda wb: _apply_events_to_workbook(wb, excel_path, events))
+    except Exception as e:
+        # 内存中的索引可能包含未保存的修改，丢弃后下次重建
+        _STATE.invalidate(excel_path)
+        print(f"更新失败: {e}")
+        raise
+    for kind, file_path, target_row in results:
+        if kind == "deleted":
+            print(f"已标记删除: {excel_path} (Row {target_row}) {os.path.basename(file_path)}")
+        else:
+            print(f"已更新: {excel_path} (Row {target_row}) {os.path.basename(file_path)}")
+    return results
 
+def _apply_events_to_workbook(wb, excel_path, events):
+    # 新文件按工作表攒在一起批量登记；同一工作表遇到改名/删除时先把之前攒的写入，
+    # 保持到达顺序。整批只保存一次
+    sheets = _STATE.sheets(excel_path)
+    structure = _STATE.structure(excel_path)
+    results = []
+    adds = {}  # 分类 -> [file_path]
+    queued = {}  # 分类 -> set(file_path)，补登时判断是否已在 adds 中
+    states = {}  # 分类 -> SheetState，补登时每个分类只定位一次工作表
+
+    def sheet_state(category_label):
+        if category_label not in states:
+            states[category_label] = _sheet_state_com(wb, sheets, category_label, structure)[1]
+        return states[category_label]
+
+    def queue(category_label, file_path):
+        adds.setdefault(category_label, []).append(file_path)
+        queued.setdefault(category_label, set()).add(file_path)
+
+    def flush(category_label):
+        paths = adds.pop(category_label, None)
+        queued.pop(category_label, None)
+        if paths:
+            added = _apply_files_to_sheet(wb, sheets, category_label, paths, structure)
+            results.extend(("created", file_path, row) for file_path, row in added)
+
+    def apply(kind, file_path, src):
         category_label = _category_label_from_path(file_path)
+        if kind == "reconcile":
+            if file_path not in queued.get(category_label, ()) and not _is_registered(sheet_state(category_label), file_path):
+                queue(category_label, file_path)
+        elif kind == "deleted":
+            flush(category_label)
+            results.extend(_mark_deleted_in_sheet(wb, sheets, category_label, file_path, structure))
+        elif kind == "tree_deleted":
+            category_label = _category_label_of_dir(file_path)
+            flush(category_label)
+            results.extend(_mark_tree_deleted_in_sheet(wb, sheets, category_label, file_path, structure))
+        elif src:
+            src_label = _category_label_from_path(src)
+            flush(category_label)
+            flush(src_label)
+            results.extend(_rename_in_sheet(wb, sheets, src_label, category_label, src, file_path, structure))
+        else:
+            queue(category_label, file_path)
+
+    with _METRICS.timer("apply"):
+        for event in events:
+            if event.kind in TREE_KINDS:
+                # 整个目录树：展开为逐个文件，仍在这一次会话中登记
+                for kind, file_path, src in _expand_tree_event(excel_path, event):
+                    apply(kind, file_path, src)
+            else:
+                apply(event.kind, event.path, event.src)
+        for category_label in list(adds):
+            flush(category_label)
+    _METRICS.inc("rows_written", len(results))
+
+    if results:
+        with _METRICS.timer("save"):
+            wb.Save()
+        _STATE.mark_saved(excel_path)
+    return results
+
+def _file_workbook(file_path):
+    # 文件所属的收文目录：忽略的文件、无法路由的位置为 None（路径不必存在）
+    if file_path is None or _is_ignored_file(os.path.basename(file_path)):
+        return None
+    route = _routes().route_file(file_path)
+    return route.workbook if route else None
+
+def _moved_from(file_path, directory, src):
+    # 目录从 src 移到 directory 后，其中文件改名前的路径
+    return os.path.join(src, os.path.relpath(file_path, directory)) if src else None
+
+def _tree_workbooks(directory, src=None):
+    # 目录树涉及的收文目录：文件的新位置与原位置（移动时）所属的都算
+    def route(file_path):
+        return (_file_workbook(file_path), _file_workbook(_moved_from(file_path, directory, src)))
+
+    groups, _ = scan_tree(directory, route)
+    return {excel_path for pair in groups for excel_path in pair if excel_path}
+
+def _expand_tree_event(excel_path, event):
+    # 目录树事件展开为 (kind, path, src)，只取与本收文目录有关的文件：
+    # 新旧位置都属于本收文目录为改名（改写超链接），只有新位置为新增，只有原位置为删除
+    directory, src = event.path, event.src
+
+    def route(file_path):
+        if excel_path in (_file_workbook(file_path), _file_workbook(_moved_from(file_path, directory, src))):
+            return excel_path
+        return None
+
+    groups, _ = scan_tree(directory, route)
+    expanded = []
+    for file_path in arrival_order(groups.get(excel_path, [])):
+        old = _moved_from(file_path, directory, src)
+        moved_here = _file_workbook(file_path) == excel_path
+        if old is None or _file_workbook(old) != excel_path:
+            expanded.append(("created", file_path, None))
+        elif not moved_here:
+            expanded.append(("deleted", old, None))
+        elif _category_label_from_path(old) != _category_label_from_path(file_path):
+            # 移到另一分类：拆成删除标记 + 新增，新增部分按工作表成批写入
+            expanded.extend([("deleted", old, None), ("created", file_path, None)])
+        else:
+            expanded.append(("moved", file_path, old))
+    return expanded
+
+def _find_file_row(state, file_path):
+    # 只按文件名（及相对路径）查找，不按文号：同一文号的其他文件不受影响
+    filename = os.path.basename(file_path)
+    return state.index.find("", os.path.relpath(file_path, WATCH_DIR), filename)
+
+def _mark_deleted_in_sheet(wb, sheets, category_label, file_path, structure=None):
+    ws, state = _sheet_state_com(wb, sheets, category_label, structure)
+    if state is None:
+        return []
+    row = _find_file_row(state, file_path)
+    if row is None or "备注" not in state.hm:
+        return []
+    RowWriter(ws, state.hm, state.snapshot).write(row, {"备注": DELETED_NOTE})
+    return [("deleted", file_path, row)]
+
+def _category_label_of_dir(directory):
+    # 目录所属分类：监控目录下的第一级目录（目录可能已不存在，也可能就是分类目录本身）
+    return routing.category_label(os.path.relpath(directory, WATCH_DIR).split(os.sep)[0])
+
+def _load_link_paths(ws, state):
+    # 超链接地址只在按目录查找时用到：第一次用到时读取一次，之后随本进程写入的超链接同步
+    if state.index.has_paths:
+        return
+    file_col = state.hm.get("文件名")
+    links = []
+    with _METRICS.timer("read"):
+        for link in ws.Hyperlinks:
+            cell = link.Range
+            if cell.Column == file_col:
+                links.append((cell.Row, link.Address))
+    state.index.load_paths(links)
+
+def _mark_tree_deleted_in_sheet(wb, sheets, category_label, directory, structure=None):
+    # 目录已删除，无法再列出其中的文件：按超链接地址的前缀找出目录下登记过的行，逐行标记删除
+    ws, state = _sheet_state_com(wb, sheets, category_label, structure)
+    if state is None or "备注" not in state.hm:
+        return []
+    _load_link_paths(ws, state)
+    snap, hm = state.snapshot, state.hm
+    writer = RowWriter(ws, hm, snap)
+    results = []
+    for row in state.index.rows_under(os.path.relpath(directory, WATCH_DIR)):
+        if snap.text(row, hm["备注"]) == DELETED_NOTE:
+            continue
+        writer.write(row, {"备注": DELETED_NOTE})
+        filename = snap.text(row, hm["文件名"]) if "文件名" in hm else ""
+        results.append(("deleted", os.path.join(directory, filename), row))
+    return results
+
+def _rename_in_sheet(wb, sheets, src_label, category_label, src_path, file_path, structure=None):
+    # 改名/移动：在索引中找到原文件的行，原地改写文件名、超链接（文号变了也改写）；
+    # 原文件未登记时按新文件登记
+    def add():
+        added = _apply_files_to_sheet(wb, sheets, category_label, [file_path], structure)
+        return [("created", p, row) for p, row in added]
+
+    if src_label != category_label:
+        # 移到另一分类（另一张工作表）：原表标记删除，新表登记
+        return _mark_deleted_in_sheet(wb, sheets, src_label, src_path, structure) + add()
+
+    ws, state = _sheet_state_com(wb, sheets, category_label, structure)
+    if state is None:
+        return []
+    row = _find_file_row(state, src_path)
+    if row is None:
+        return add()
+
+    snap, hm = state.snapshot, state.hm
+    filename = os.path.basename(file_path)
+    doc_no = _extract_doc_no(filename)
+    existing_row = state.index.find(doc_no, os.path.relpath(file_path, WATCH_DIR), filename)
+    if existing_row and existing_row != row:
+        # 新名字已经登记在另一行：原行标记删除，更新已有的那一行
+        return _mark_deleted_in_sheet(wb, sheets, src_label, src_path, structure) + add()
+
+    # 只写变化了的单元格：目录改名时文件名不变，只改写超链接地址
+    values = {}
+    if "文件名" in hm and snap.text(row, hm["文件名"]) != filename:
+        values["文件名"] = filename
+    if "备注" in hm and snap.text(row, hm["备注"]):
+        values["备注"] = ""
+    old_doc_no = snap.text(row, hm["文号"]) if "文号" in hm else ""
+    if doc_no and _normalize_doc_no(old_doc_no) != doc_no:
+        values["文号"] = doc_no
+    else:
+        doc_no = old_doc_no
+    writer = RowWriter(ws, hm, snap)
+    writer.write(row, values)
+    writer.link(row, "文件名", os.path.relpath(file_path, WATCH_DIR), filename, replace=True)
+    state.index.set_row(row, doc_no, filename)
+    state.index.set_path(row, os.path.relpath(file_path, WATCH_DIR))
+    return [("moved", file_path, row)]
+
+def _sheet_state_com(wb, sheets, category_label, structure=None):
+    # structure 缓存分类 -> 工作表序号与表头位置，避免每次遍历工作表名、重新找表头
+    if structure is not None:
+        sheet_index = structure.sheet_index(wb, category_label, _find_sheet_index_com)
+    else:
         sheet_index = _find_sheet_index_com(wb, category_label)
-        
-        if sheet_index is None:
-            print(f"找不到对应工作表: {category_label}")
-            return
-            
-        ws = wb.Worksheets(sheet_index)
-        header_row, hm = _find_header_map_com(ws)
-        
+
+    if sheet_index is None:
+        print(f"找不到对应工作表: {category_label}")
+        return None, None
+
+    ws = wb.Worksheets(sheet_index)
+    state = sheets.get(ws.Name)
+    if state is None:
+        # 整张表只读取一次；快照与索引随本进程的写入同步更新，直到工作簿被外部修改
+        with _METRICS.timer("read"):
+            snap = SheetSnapshot.read(ws)
+        if structure is not None:
+            header_row, hm = structure.header(ws.Name, snap, _find_header_map_com)
+        else:
+            header_row, hm = _find_header_map_com(snap)
+
         if not hm:
             print(f"工作表缺少表头: {ws.Name}")
-            return
-            
+            return ws, None
+        state = SheetState(snap, header_row, hm)
+        sheets[ws.Name] = state
+    return ws, state
+
+def _apply_files_to_sheet(wb, sheets, category_label, file_paths, structure=None):
+    ws, state = _sheet_state_com(wb, sheets, category_label, structure)
+    if state is None:
+        return []
+
+    snap, header_row, hm, index = state.snapshot, state.header_row, state.hm, state.index
+    writer = RowWriter(ws, hm, snap)
+    results = []
+    planned = {}  # row -> [record, rel_path, filename]，本批待插入的新行
+    planned_years = {}  # row -> file_path，用于按年份分配自编号
+
+    for file_path in dict.fromkeys(file_paths):
         filename = os.path.basename(file_path)
         rel_path = os.path.relpath(file_path, WATCH_DIR)
         doc_no = _extract_doc_no(filename)
-        
-        existing_row = _find_existing_row_com(ws, header_row, hm, doc_no, rel_path, filename)
-        
-        if existing_row:
+
+        existing_row = index.find(doc_no, rel_path, filename)
+
+        if existing_row in planned:
+            # 与本批前面的新行重复：改写那条待插入记录
+            plan = planned[existing_row]
+            plan[0]["文件名"] = filename
+            plan[1] = rel_path
+            plan[2] = filename
+            snap.set(existing_row, hm["文件名"], filename)
             target_row = existing_row
-            # Update Filename
-            cell = ws.Cells(target_row, hm["文件名"])
-            cell.Value = filename
-            
-            # Re-add hyperlink (safe to delete old one first if needed, but Add usually overwrites or adds)
-            # To be clean, delete existing hyperlinks on that cell
-            try:
-                cell.Hyperlinks.Delete()
-            except:
-                pass
-                
-            ws.Hyperlinks.Add(Anchor=cell, Address=rel_path, TextToDisplay=filename)
-            
-            if "备注" in hm:
-                ws.Cells(target_row, hm["备注"]).Value = ""
-                
+            index.set_row(target_row, snap.text(target_row, hm["文号"]) if "文号" in hm else "", filename)
+
+        elif existing_row:
+            target_row = existing_row
+            # Update Filename (and clear 备注) in place, then replace the old hyperlink
+            writer.write(target_row, {"文件名": filename, "备注": ""})
+            writer.link(target_row, "文件名", rel_path, filename, replace=True)
+            index.set_row(target_row, snap.text(target_row, hm["文号"]) if "文号" in hm else "", filename)
+            index.set_path(target_row, rel_path)
+
         else:
-            target_row = _find_first_empty_row_com(ws, header_row, hm)
-            
-            # Prepare data
-            year_two = _find_year_two_digits(file_path) or "25"
-            year_full = f"20{year_two}"
-            
-            # DATE FIX: Use current time instead of file mtime
-            date_fmt = _infer_date_format_com(ws, header_row, hm.get("收文日期"))
-            if date_fmt == "slash":
-                received_date = datetime.now().strftime("%Y/%m/%d")
-            else:
-                received_date = datetime.now().strftime("%Y.%m.%d")
-                
-            self_id = _generate_self_id_com(ws, header_row, hm.get("自编号"), year_full, category_label)
-            transmit = ""
-            if "传阅方式" in hm:
-                transmit = _infer_last_nonempty_com(ws, header_row, hm["传阅方式"])
-            
-            seq = _next_seq_com(ws, header_row, hm, target_row)
-            
-            # Write Data
-            if "序号" in hm: ws.Cells(target_row, hm["序号"]).Value = seq
-            if "收文日期" in hm: ws.Cells(target_row, hm["收文日期"]).Value = received_date
-            if "文号" in hm: ws.Cells(target_row, hm["文号"]).Value = doc_no
-            if "自编号" in hm: ws.Cells(target_row, hm["自编号"]).Value = self_id
-            if "传阅方式" in hm: ws.Cells(target_row, hm["传阅方式"]).Value = transmit
-            if "存盒位置" in hm: ws.Cells(target_row, hm["存盒位置"]).Value = ""
-            if "备注" in hm: ws.Cells(target_row, hm["备注"]).Value = ""
-            
-            # Filename & Link
-            cell = ws.Cells(target_row, hm["文件名"])
-            cell.Value = filename
-            ws.Hyperlinks.Add(Anchor=cell, Address=rel_path, TextToDisplay=filename)
+            # 行号与序号由 RowAllocator 给出：先填表内空行，再追加到末尾
+            target_row, seq = state.rows.allocate()
+            record = _new_record(snap, header_row, hm, target_row, doc_no, filename, seq)
+            # 先写入快照，使本批后续文件的行号、序号、自编号顺延
+            for key, value in record.items():
+                if key in hm:
+                    snap.set(target_row, hm[key], value)
+            planned[target_row] = [record, rel_path, filename]
+            planned_years[target_row] = file_path
+            index.set_row(target_row, doc_no, filename)
 
-        wb.Save()
-        print(f"已更新: {excel_path} (Row {target_row})")
-        
-    except Exception as e:
-        print(f"更新失败: {e}")
+        results.append((file_path, target_row))
+
+    # 一次性为本批新行预留连续的自编号（按年份分组，组内保持到达顺序）
+    by_year = {}
+    for target_row, file_path in planned_years.items():
+        by_year.setdefault(f"20{_find_year_two_digits(file_path) or '25'}", []).append(target_row)
+    prefix = _prefix_for_category(category_label)
+    for year_full, target_rows in by_year.items():
+        for target_row, self_id in zip(target_rows, state.self_ids.reserve(prefix, year_full, len(target_rows))):
+            planned[target_row][0]["自编号"] = self_id
+            if "自编号" in hm:
+                snap.set(target_row, hm["自编号"], self_id)
+
+    # Write consecutive new rows in one Range assignment each, then the links
+    rows = sorted(planned)
+    i = 0
+    while i < len(rows):
+        j = i
+        while j + 1 < len(rows) and rows[j + 1] == rows[j] + 1:
+            j += 1
+        writer.write_rows(rows[i], [planned[r][0] for r in rows[i:j + 1]])
+        i = j + 1
+    for r in rows:
+        _, rel_path, filename = planned[r]
+        writer.link(r, "文件名", rel_path, filename)
+        index.set_path(r, rel_path)
+
+    return results
+
+def _new_record(snap, header_row, hm, target_row, doc_no, filename, seq=None):
+    # 自编号 is filled in afterwards from the sheet's cached counters
+
+    # DATE FIX: Use current time instead of file mtime
+    date_fmt = _infer_date_format_com(snap, header_row, hm.get("收文日期"))
+    if date_fmt == "slash":
+        received_date = datetime.now().strftime("%Y/%m/%d")
+    else:
+        received_date = datetime.now().strftime("%Y.%m.%d")
+
+    transmit = ""
+    if "传阅方式" in hm:
+        transmit = _infer_last_nonempty_com(snap, header_row, hm["传阅方式"])
+
+    if seq is None:
+        seq = _next_seq_com(snap, header_row, hm, target_row)
+
+    return {
+        "序号": seq,
+        "收文日期": received_date,
+        "文号": doc_no,
+        "文件名": filename,
+        "自编号": None,
+        "传阅方式": transmit,
+        "存盒位置": "",
+        "备注": "",
+    }
+
+def _is_registered(state, file_path):
+    # 找不到工作表（state 为 None）时按已登记处理，不新增
+    if state is None:
+        return True
+    filename = os.path.basename(file_path)
+    return state.index.contains(_extract_doc_no(filename), os.path.relpath(file_path, WATCH_DIR), filename)
+
+def _reconcile_events(file_paths):
+    received = time.monotonic()
+    return [FileEvent(None, p, "reconcile", None, received) for p in arrival_order(file_paths)]
+
+def _cached_missing(excel_path, file_paths):
+    # 收文目录自上次保存/读取后未被修改、涉及的工作表都有索引时，不打开工作簿即可比对；
+    # 否则返回 None
+    sheets = _STATE.cached_sheets(excel_path)
+    if not sheets:
+        return None
+    structure = _STATE.structure(excel_path)
+    missing = []
+    for file_path in file_paths:
+        state = sheets.get(structure.sheet_name(_category_label_from_path(file_path)))
+        if state is None:
+            return None
+        filename = os.path.basename(file_path)
+        if not state.index.contains(_extract_doc_no(filename), os.path.relpath(file_path, WATCH_DIR), filename):
+            missing.append(file_path)
+    return missing
+
+def _reconcile_missing(excel_path, file_paths, batcher=None):
+    # 与目录比对，只登记尚未登记的文件；整本工作簿一次会话、一次保存，
+    # 为补登而打开的收文目录随即释放（文件夹打开时用户常要用 Excel 打开它）。
+    # 收文目录被锁定时交给批处理器，按推迟重试的退避等到解锁后再补登，返回 None
+    cached = _cached_missing(excel_path, file_paths)
+    if cached is not None:
+        if not cached:
+            return []
+        file_paths = cached
+    host = _get_host()
+    was_open = host.is_open(excel_path)
+    if not was_open and _is_file_locked(excel_path):
+        if batcher is None:
+            raise RuntimeError("文件被锁定")
+        for event in _reconcile_events(file_paths):
+            batcher.submit(excel_path, event)
+        return None
+    events = _reconcile_events(file_paths)
+    try:
+        results = host.run(excel_path, lambda wb: _apply_events_to_workbook(wb, excel_path, events))
+    except Exception:
+        _STATE.invalidate(excel_path)
+        raise
     finally:
-        # 强制释放资源
-        if wb:
-            try:
-                wb.Close(SaveChanges=True)
-            except: pass
-            del wb
-        if app:
-            try:
-                app.Quit()
-            except: pass
-            del app
+        if not was_open:
+            host.release(excel_path)
+    return [file_path for _, file_path, _ in results]
+
+def _reconcile_on_startup(batcher=None):
+    routes = _routes()
+
+    def route(file_path):
+        if _is_ignored_file(os.path.basename(file_path)):
+            return None
+        found = routes.route_file(file_path)
+        return found.workbook if found else None
+
+    return reconcile(WATCH_DIR, route, lambda excel_path, paths: _reconcile_missing(excel_path, paths, batcher))
+
+def _process_batch(excel_path, events):
+    # events: [FileEvent]；保存成功后才从事件日志中删除。
+    # 失败或被锁定时异常交给 EventBatcher：该工作簿的事件推迟重试，其他工作簿不受影响
+    started = time.monotonic()
+    _METRICS.inc("batches")
+    _METRICS.inc("batch_events", len(events))
+    for event in events:
+        if event.received is not None:
+            _METRICS.observe("batch_wait", started - event.received)
+    if _JOURNAL is not None:
+        _JOURNAL.flush()
+    try:
+        _update_workbook_events(excel_path, events)
+    except DeferBatch:
+        _METRICS.inc("batches_deferred")
+        raise
+    except Exception:
+        _METRICS.inc("batches_failed")
+        raise
+    if _JOURNAL is not None:
+        _JOURNAL.mark_done([event.entry_id for event in events])
+    _startup_mark("first_saved")
+    _observe_saved(events)
+
+def _observe_saved(events):
+    # 端到端耗时：收到事件 -> 保存（event_to_saved），新文件落盘 -> 保存（file_to_saved）。
+    # 落盘时间取修改时间与 ctime 中较晚的一个：复制时修改时间保留原文件的，Windows 上 ctime 是创建时间
+    saved, now = time.time(), time.monotonic()
+    for event in events:
+        if event.received is not None:
+            _METRICS.observe("event_to_saved", now - event.received)
+        if event.kind != "created":
+            continue
         try:
-            pythoncom.CoUninitialize()
-        except: pass
+            st = os.stat(event.path)
+        except OSError:
+            continue
+        _METRICS.observe("file_to_saved", saved - max(st.st_mtime, st.st_ctime))
+
+def _journal_event(excel_path, file_path, kind, src=None):
+    if _JOURNAL is None:
+        return None
+    return _JOURNAL.append(excel_path, file_path, kind, src)
+
+def _discard_vanished(item):
+    # 等待写入完成期间文件被删除或改名：不再登记，从事件日志中删除
+    excel_path, event = item
+    _METRICS.inc("events_vanished")
+    print(f"跳过（文件已不存在）: {event.path}")
+    if _JOURNAL is not None:
+        _JOURNAL.mark_done([event.entry_id])
+
+def _replay_journal(batcher):
+    # 上次未完成（崩溃、被结束或多次失败）的事件重新排队，保留原编号
+    entries = _JOURNAL.pending() if _JOURNAL is not None else []
+    if not entries:
+        return
+    print(f"重放事件日志中未完成的事件: {len(entries)} 个")
+    for entry_id, excel_path, file_path, kind, src in entries:
+        # 删除事件要求文件仍不存在，其余要求文件（目录树事件为目录）仍存在
+        if not os.path.exists(excel_path) or os.path.exists(file_path) == (kind in ("deleted", "tree_deleted")):
+            _JOURNAL.mark_done([entry_id])
+            continue
+        batcher.submit(excel_path, FileEvent(entry_id, file_path, kind, src))
 
 def _excel_path_for_year(year_two_digits):
-    excel_name = f"20{year_two_digits}工区收文目录.xls"
-    p1 = os.path.join(WATCH_DIR, excel_name)
-    if os.path.exists(p1):
-        return p1
-    return None
+    return _routes().workbook_for_year(year_two_digits)
+
+def _is_ignored_file(filename):
+    # 程序自己的文件总是忽略：事件日志、指标文件、xls 后端保存时先写出的 *.saving；其余按规则文件
+    return (
+        filename.startswith(JOURNAL_PREFIX)
+        or filename.startswith(METRICS_PREFIX)
+        or filename.endswith(".saving")
+        or _rules().is_ignored(filename)
+    )
+
+def _is_save_rename(event):
+    # Excel 保存时经过临时名（规则文件 temp_pattern）的改名
+    rules = _rules()
+    return rules.is_temp_name(os.path.basename(event.src)) or rules.is_temp_name(os.path.basename(event.path))
+
+class AutoHyperlinkHandler:
+    # 按 watchdog 的事件处理接口（dispatch）实现，不继承 FileSystemEventHandler，
+    # 导入本模块时不必加载 watchdog
+    def __init__(self, batcher, event_filter=None, stability=None):
+        self.batcher = batcher
+        # 忽略规则与重复事件在进入工作簿处理之前过滤掉（见 event_filter.py）
+        self.filter = event_filter or EventFilter(_is_ignored_file)
+        # 有 stability 时文件写入完成后才交给批处理，否则直接交给批处理
+        self.stability = stability
+        # 等待写入完成的改名：新路径 -> (收文目录, 事件)。删除不等写入完成，可能先于改名到达批处理，
+        # 新路径随即被删除时在这里改为删除原路径（见 on_deleted）
+        self._renames = {}
+
+    def dispatch(self, event):
+        handler = getattr(self, f"on_{event.event_type}", None)
+        if handler is not None:
+            handler(event)
 
-class AutoHyperlinkHandler(FileSystemEventHandler):
     def on_created(self, event):
         if event.is_directory:
+            _routes().add_dir(event.src_path)
+            if not self.filter.covers(event.src_path):
+                self._handle_tree(event.src_path)
             return
         self._handle(event.src_path, "created")
 
     def on_moved(self, event):
         if event.is_directory:
+            _routes().move_dir(event.src_path, event.dest_path)
+            if not self.filter.covers(event.dest_path, event.src_path):
+                self._handle_tree(event.dest_path, event.src_path)
             return
-        self._handle(event.dest_path, "moved")
-        
-    def _handle(self, file_path, kind):
-        filename = os.path.basename(file_path)
-        if filename.startswith("~$") or filename.lower().endswith(".tmp") or \
-           filename.lower() in ["autohyperlink.exe", "auto_hyperlink.py", "auto_hyperlink.spec"]:
+        _routes().workbook_changed(event.src_path)
+        self.filter.forget(event.src_path)
+        self._handle(event.dest_path, "moved", event.src_path)
+
+    def on_deleted(self, event):
+        routes = _routes()
+        # Windows 上删除目录也是 FileDeletedEvent：按路由表中已知的目录判断
+        if event.is_directory or routes.is_dir(event.src_path):
+            self._handle_tree_deleted(event.src_path)
+            return
+        routes.workbook_changed(event.src_path)
+        self.filter.forget(event.src_path)
+        if _is_ignored_file(os.path.basename(event.src_path)):
+            return
+        pending = self._renames.pop(_path_key(event.src_path), None)
+        if pending is not None:
+            # 改名后随即删除：改名还在等待写入完成，文件消失后被丢弃；登记为原路径被删除，
+            # Excel 保存时经过临时名的改名则什么都不登记
+            excel_path, renamed = pending
+            if _is_save_rename(renamed):
+                print(f"跳过（改名后随即删除）: {event.src_path}")
+                return
+            print(f"File deleted: {renamed.src} (renamed to {event.src_path})")
+            self._submit(excel_path, renamed.src, "deleted")
+            return
+        route = routes.route_file(event.src_path)
+        if route is None or not route.workbook:
+            return
+        print(f"File deleted: {event.src_path}")
+        self._submit(route.workbook, event.src_path, "deleted")
+
+    def _submit(self, excel_path, file_path, kind, src=None):
+        # 先记入事件日志，再交给批处理阶段：静默期内的事件合并为一次工作簿会话。
+        # 新建与改名等文件写入完成后再处理；删除与目录树直接交给批处理
+        event = FileEvent(_journal_event(excel_path, file_path, kind, src), file_path, kind, src, time.monotonic())
+        _METRICS.inc(f"events_{kind}")
+        if self.stability is not None and kind in ("created", "moved"):
+            if src is not None:
+                self._renames[_path_key(file_path)] = (excel_path, event)
+            self.stability.track(file_path, (excel_path, event))
+        else:
+            self.batcher.submit(excel_path, event)
+
+    def release(self, item):
+        # 写入完成（StabilityScheduler 放行）；新目录此时才按收文目录展开
+        excel_path, event = item
+        self._settled(event)
+        if event.received is not None:
+            _METRICS.observe("stability_wait", time.monotonic() - event.received)
+        if excel_path is None:
+            self._submit_tree(event.path)
+            self.filter.uncover(event.path)
+        else:
+            self.batcher.submit(excel_path, event)
+
+    def vanished(self, item):
+        excel_path, event = item
+        self._settled(event)
+        if excel_path is None:
+            self.filter.uncover(event.path)
+        _discard_vanished(item)
+
+    def _settled(self, event):
+        # 改名已交给批处理（或被丢弃）：之后的删除按顺序排在它后面
+        key = _path_key(event.path)
+        pending = self._renames.get(key)
+        if pending is not None and pending[1] is event:
+            self._renames.pop(key, None)
+
+    def _handle_tree_deleted(self, directory):
+        # 目录被删除：其下登记过的行按超链接地址找出，每本收文目录一个 tree_deleted 事件
+        routes = _routes()
+        workbooks = routes.workbooks_under(directory)
+        routes.remove_dir(directory)
+        if not workbooks:
             return
-        if re.match(r"^20\d{2}工区收文目录\.xls$", filename):
+        print(f"Directory deleted: {directory}")
+        for excel_path in sorted(workbooks):
+            self._submit(excel_path, directory, "tree_deleted")
+
+    def _handle_tree(self, directory, src=None):
+        # 目录树整体处理：每本收文目录一个 tree_created / tree_moved 事件，一次会话登记或改写，
+        # 不依赖 watchdog 为其中每个文件补发的事件（这些事件被 EventFilter 丢弃）
+        _startup_mark("first_event")
+        if src is not None:
+            # 移动、改名是瞬时的：补发的 moved 事件按原目录丢弃，立即展开
+            self.filter.cover(src, DEDUP_WINDOW)
+            print(f"Directory moved: {src} -> {directory}")
+            self._submit_tree(directory, src)
+            return
+        # 新目录可能还在复制：目录下的事件全部丢弃，整棵树不再变化后再展开（见 release）
+        self.filter.cover(directory)
+        print(f"Directory created: {directory}")
+        item = (None, FileEvent(None, directory, "tree_created", None, time.monotonic()))
+        if self.stability is not None:
+            self.stability.track(directory, item)
+        else:
+            self.release(item)
+
+    def _submit_tree(self, directory, src=None):
+        kind = "tree_moved" if src else "tree_created"
+        workbooks = _tree_workbooks(directory, src)
+        if not workbooks:
+            print(f"跳过（目录中没有需要登记的文件）: {directory}")
+            return
+        for excel_path in sorted(workbooks):
+            self._submit(excel_path, directory, kind, src)
+
+    def _handle(self, file_path, kind, src=None):
+        routes = _routes()
+        routes.workbook_changed(file_path)
+        if not self.filter.accept(file_path, src):
             return
             
-        year = _find_year_two_digits(file_path)
-        if not year:
-            print(f"跳过（无法识别年份目录 25/26）: {file_path}")
+        route = routes.route_file(file_path)
+        if route is None:
+            print(f"跳过（无法识别两位数年份目录）: {file_path}")
             return
             
-        excel_path = _excel_path_for_year(year)
+        excel_path = route.workbook
         if not excel_path:
-            print(f"跳过（找不到收文目录表）: 20{year}工区收文目录.xls")
+            print(f"跳过（找不到收文目录表）: {_rules().workbook_name.format(year=route.year)}")
             return
             
+        if src is not None:
+            src_route = None if _is_ignored_file(os.path.basename(src)) else routes.route_file(src)
+            if src_route is None or not src_route.workbook:
+                # 从临时文件（保存时的改名）或未登记的位置改名而来：按新文件处理
+                src = None
+            elif src_route.workbook != excel_path:
+                # 跨收文目录（年份不同）：原收文目录中标记删除，新收文目录中登记
+                self._submit(src_route.workbook, src, "deleted")
+                src = None
+
         print(f"File {kind}: {file_path}")
-        
-        # Retry loop
-        for attempt in range(RETRIES):
-            try:
-                _update_workbook(excel_path, file_path)
-                return
-            except Exception as e:
-                print(f"Attempt {attempt+1} failed: {e}")
-                time.sleep(RETRY_DELAY)
-        print("多次重试仍失败。")
+        _startup_mark("first_event")
+        self._submit(excel_path, file_path, kind, src)
+
+def _open_journal():
+    global _JOURNAL
+    try:
+        _JOURNAL = EventJournal(journal_path(WATCH_DIR))
+    except Exception as e:
+        print(f"无法打开事件日志，本次运行不做持久化: {e}")
+        _JOURNAL = None
+
+def _close_journal():
+    global _JOURNAL
+    if _JOURNAL is not None:
+        _JOURNAL.close()
+        _JOURNAL = None
+
+class WatchSession:
+    """The watcher, loaded once and kept for the whole process.
+
+    ``start()`` opens the journal, builds the routing table and starts the
+    batcher and the observer. ``pause()`` stops watching the folder, applies
+    what is already queued and releases the workbooks; ``resume()`` watches
+    again and registers whatever arrived in between. folder_monitor.py
+    pauses and resumes it as the folder is closed and opened.
+
+    While it runs, the pipeline metrics are written next to the exe every
+    ``METRICS_INTERVAL`` seconds (see metrics.py).
+    """
+
+    def __init__(self):
+        self.batcher = None
+        self.filter = None
+        self.stability = None
+        self.observer = None
+        self.metrics_writer = None
+        self._handler = None
+        self._watch = None
+
+    @property
+    def paused(self):
+        return self._watch is None
+
+    def start(self, paused=False):
+        _open_journal()
+        print(f"路由表已建立: {_routes().build()} 个目录")
+        self.batcher = EventBatcher(_process_batch, defer_base=RETRY_DELAY, max_attempts=RETRIES)
+        self.filter = EventFilter(_is_ignored_file)
+        self.stability = StabilityScheduler(
+            lambda item: self._handler.release(item), lambda item: self._handler.vanished(item),
+            stable_seconds=STABLE_SECONDS,
+        )
+        self._handler = AutoHyperlinkHandler(self.batcher, self.filter, self.stability)
+        # 队列深度在写出指标时才采样
+        _METRICS.gauge("stability_pending", self.stability.pending_count)
+        _METRICS.gauge("batch_pending", self.batcher.pending_count)
+        _METRICS.gauge("batch_deferred_workbooks", lambda: len(self.batcher.deferred_keys()))
+        _METRICS.gauge("events_dropped", self.filter.dropped)
+        if METRICS_INTERVAL > 0:
+            self.metrics_writer = MetricsWriter(_METRICS, WATCH_DIR, interval=METRICS_INTERVAL)
+        from watchdog.observers import Observer
+        self.observer = Observer()
+        self.observer.start()
+        _replay_journal(self.batcher)
+        if paused:
+            print(f"已加载，等待打开文件夹: {WATCH_DIR}")
+        else:
+            self._watch_folder()
+
+    def _watch_folder(self):
+        self._watch = self.observer.schedule(self._handler, WATCH_DIR, recursive=True)
+        print(f"Monitoring {WATCH_DIR} for changes ({_backend_name().upper()} Mode)...")
+        _startup_mark("watching")
+        if RECONCILE_ON_STARTUP:
+            # 观察者已启动，补登期间到达的新事件不会丢失
+            _reconcile_on_startup(self.batcher)
+        _startup_mark("ready")
+
+    def resume(self):
+        global _ROUTES
+        if not self.paused:
+            return
+        # 暂停期间目录和收文目录可能有增删改名，路由表重新建立
+        _ROUTES = None
+        _routes().build()
+        self._watch_folder()
+
+    def pause(self, timeout=DRAIN_TIMEOUT):
+        if self.paused:
+            return
+        self.observer.unschedule(self._watch)
+        self._watch = None
+        deadline = time.time() + timeout
+        # 先等正在复制的文件写完并交给批处理，再排空批处理
+        drained = self.stability.wait_idle(timeout=timeout)
+        drained = self.batcher.drain(timeout=max(0.0, deadline - time.time())) and drained
+        if _JOURNAL is not None:
+            _JOURNAL.flush()
+        # 释放收文目录，文件夹关闭期间可以直接用 Excel 打开
+        _close_host()
+        if drained:
+            print("已暂停监控")
+        else:
+            print("已暂停监控（部分事件尚未写入，保留在事件日志中，恢复后继续）")
+        self._print_filter_counts()
+        if self.metrics_writer is not None:
+            self.metrics_writer.write()
+
+    def _print_filter_counts(self):
+        if self.filter is not None:
+            c = self.filter.counts()
+            print(f"事件预过滤：放行 {c['accepted']}，忽略 {c['ignored']}，重复 {c['duplicate']}，"
+                  f"随目录处理 {c['covered']}")
+
+    def close(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+        if self.stability is not None:
+            # 仍在等待写入完成的文件留在事件日志中，下次启动时重放
+            self.stability.close()
+        if self.batcher is not None:
+            self.batcher.close()
+        _close_journal()
+        _close_host()
+        self._print_filter_counts()
+        if self.metrics_writer is not None:
+            # 写出最后一次
+            self.metrics_writer.close()
+            self.metrics_writer = None
 
 def main():
+    _startup_mark("main")
     if not os.path.exists(WATCH_DIR):
         print(f"目录不存在: {WATCH_DIR}")
         return
         
-    handler = AutoHyperlinkHandler()
-    observer = Observer()
-    observer.schedule(handler, WATCH_DIR, recursive=True)
-    observer.start()
-    print(f"Monitoring {WATCH_DIR} for changes (COM Mode)...")
+    session = WatchSession()
+    session.start()
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
-        observer.stop()
-    observer.join()
+        pass
+    session.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,122 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+TEMPLATE = "2026工区收文目录.verify.tmp.xls"
+FILE_DIR = os.path.join("1-上级文", "26")
+TIMEOUT_SECONDS = 60
+
+
+def _read_marks(log_path):
+    marks = {}
+    try:
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                marks.setdefault(record["stage"], record)
+    except (OSError, ValueError):
+        pass
+    return marks
+
+
+def _wait_for(log_path, stage, proc):
+    deadline = time.time() + TIMEOUT_SECONDS
+    while time.time() < deadline:
+        marks = _read_marks(log_path)
+        if stage in marks:
+            return marks
+        if proc.poll() is not None:
+            raise RuntimeError(f"进程在 {stage} 之前退出，返回码 {proc.returncode}")
+        time.sleep(0.01)
+    raise RuntimeError(f"{TIMEOUT_SECONDS} 秒内未到达 {stage}")
+
+
+def run_once(base_dir, exe=None):
+    # 在临时目录中放一份程序和收文目录，与把 exe 复制到收文文件夹中的用法一致
+    root = tempfile.mkdtemp(prefix="bench_startup_")
+    log_fd, log_path = tempfile.mkstemp(prefix="bench_startup_", suffix=".jsonl")
+    os.close(log_fd)
+    os.makedirs(os.path.join(root, FILE_DIR))
+    shutil.copy2(os.path.join(base_dir, TEMPLATE), os.path.join(root, "2026工区收文目录.xls"))
+    if exe:
+        shutil.copy2(exe, root)
+        cmd = [os.path.join(root, os.path.basename(exe))]
+    else:
+        for path in glob.glob(os.path.join(base_dir, "*.py")):
+            shutil.copy2(path, root)
+        cmd = [sys.executable, os.path.join(root, "auto_hyperlink.py")]
+
+    env = dict(os.environ, AUTOHYPERLINK_STARTUP_LOG=log_path)
+    spawned = time.time()
+    proc = subprocess.Popen(cmd, cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_for(log_path, "ready", proc)
+        created = time.time()
+        open(os.path.join(root, FILE_DIR, "（上级文〔2026〕950号）启动测试.pdf"), "wb").close()
+        marks = _wait_for(log_path, "first_saved", proc)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        shutil.rmtree(root, ignore_errors=True)
+        os.remove(log_path)
+
+    result = {stage: marks[stage]["time"] - spawned for stage in ("main", "watching", "ready")}
+    result["mode"] = marks["main"]["mode"]
+    result["event_latency"] = marks["first_event"]["time"] - created
+    result["save_latency"] = marks["first_saved"]["time"] - created
+    # 最早能被发现的事件：观察者就绪时到达的文件
+    result["time_to_first_event"] = result["watching"] + result["event_latency"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时测试：从启动进程到处理第一个事件（脚本或 exe）")
+    parser.add_argument("--exe", help="测 PyInstaller 打包的 AutoHyperlink.exe；不指定时测 python auto_hyperlink.py")
+    parser.add_argument("--runs", type=int, default=5, help="重复次数，报告取中位数")
+    parser.add_argument("--out", default=os.path.join(tempfile.gettempdir(), "startup_report.json"),
+                        help="JSON 报告输出路径（默认放在临时目录，不写进源码目录）")
+    args = parser.parse_args()
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    runs = [run_once(base_dir, args.exe) for _ in range(args.runs)]
+    keys = ["main", "watching", "ready", "event_latency", "save_latency", "time_to_first_event"]
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "mode": runs[0]["mode"],
+        "median": {k: statistics.median(r[k] for r in runs) for k in keys},
+        "runs": runs,
+    }
+
+    print(f"模式: {report['mode']}，{len(runs)} 次取中位数")
+    labels = {
+        "main": "启动 -> 进入 main（解释器与导入）",
+        "watching": "启动 -> 开始监控",
+        "ready": "启动 -> 补登完成",
+        "event_latency": "新文件 -> 收到事件",
+        "save_latency": "新文件 -> 保存收文目录",
+        "time_to_first_event": "启动 -> 第一个事件",
+    }
+    for k in keys:
+        print(f"{labels[k]:<24} {report['median'][k] * 1000:9.1f} ms")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"报告已写入: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import auto_hyperlink as ah
+from fake_excel import FakeWorkbookHost, make_catalog_workbook
+from sheet_io import SheetSnapshot
+
+SHEET_SIZES = [100, 10000, 60000]
+BATCH_SIZES = [1, 10, 100, 1000]
+CATEGORY_DIR = "1-上级文"
+SHEET_NAME = "上级文电"
+
+
+def _timeit(fn, min_seconds=0.2, max_runs=1000):
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds or runs >= max_runs:
+            return elapsed / runs
+
+
+def _calls(wb):
+    total = {}
+    for ws in wb.sheets:
+        for k, v in ws.calls.items():
+            total[k] = total.get(k, 0) + v
+    return total
+
+
+def _reset_calls(wb):
+    for ws in wb.sheets:
+        for k in ws.calls:
+            ws.calls[k] = 0
+
+
+def bench_helpers(rows):
+    wb = make_catalog_workbook(os.path.join(ah.WATCH_DIR, "bench_helpers.xls"), rows)
+    ws = wb.Worksheets(SHEET_NAME)
+    snap = SheetSnapshot.read(ws)
+    header_row, hm = ah._find_header_map_com(snap)
+    missing = "（测函〔2025〕999999号）不存在的文件.pdf"
+    cases = {
+        "SheetSnapshot.read": lambda: SheetSnapshot.read(ws),
+        "_find_header_map_com": lambda: ah._find_header_map_com(snap),
+        "_find_existing_row_com": lambda: ah._find_existing_row_com(snap, header_row, hm, "", missing, missing),
+        "_find_first_empty_row_com": lambda: ah._find_first_empty_row_com(snap, header_row, hm),
+        "_next_seq_com": lambda: ah._next_seq_com(snap, header_row, hm, snap.last_row + 1),
+        "_generate_self_id_com": lambda: ah._generate_self_id_com(snap, header_row, hm["自编号"], "2025", "上级文"),
+        "_infer_date_format_com": lambda: ah._infer_date_format_com(snap, header_row, hm["收文日期"]),
+    }
+    results = []
+    for name, fn in cases.items():
+        results.append({"kind": "helper", "name": name, "rows": rows, "seconds": _timeit(fn)})
+    return results
+
+
+def bench_update(rows, batch):
+    excel_path = os.path.join(ah.WATCH_DIR, f"bench_{rows}_{batch}.xls")
+    host = FakeWorkbookHost()
+    wb = host.add(make_catalog_workbook(excel_path, rows))
+    ah._HOST = host
+    ah._STATE.invalidate(excel_path)
+    results = []
+    try:
+        for phase in ("cold", "warm"):
+            files = [
+                os.path.join(ah.WATCH_DIR, CATEGORY_DIR, "25", f"基准测试_{phase}_{i}.pdf")
+                for i in range(batch)
+            ]
+            _reset_calls(wb)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                ah._update_workbook_batch(excel_path, files)
+            elapsed = time.perf_counter() - start
+            results.append({
+                "kind": "update",
+                "name": f"_update_workbook_batch[{phase}]",
+                "rows": rows,
+                "batch": batch,
+                "seconds": elapsed,
+                "per_event_ms": elapsed * 1000 / batch,
+                "saves": wb.save_count,
+                "calls": _calls(wb),
+            })
+    finally:
+        ah._HOST = None
+        ah._STATE.invalidate(excel_path)
+    return results
+
+
+def _case_key(r):
+    return (r["kind"], r["name"], r["rows"], r.get("batch"))
+
+
+def compare(report, baseline_path, threshold):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {_case_key(r): r for r in json.load(f)["results"]}
+    regressions = []
+    for r in report["results"]:
+        old = baseline.get(_case_key(r))
+        if old and old["seconds"] > 0 and r["seconds"] / old["seconds"] > threshold:
+            regressions.append((r, old))
+    for r, old in regressions:
+        print(f"[REGRESSION] {r['name']} rows={r['rows']} batch={r.get('batch', '-')}: "
+              f"{old['seconds'] * 1000:.3f}ms -> {r['seconds'] * 1000:.3f}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="收文目录更新路径基准测试（内存假后端，无需 Excel）")
+    parser.add_argument("--out", default=os.path.join(tempfile.gettempdir(), "bench_report.json"),
+                        help="JSON 报告输出路径（默认放在临时目录，不写进源码目录）")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SHEET_SIZES, help="工作表行数")
+    parser.add_argument("--batches", type=int, nargs="+", default=BATCH_SIZES, help="每批文件数")
+    parser.add_argument("--baseline", help="与之前的报告比较，变慢超过阈值时返回非零")
+    parser.add_argument("--threshold", type=float, default=1.5, help="判定为回退的耗时倍数")
+    args = parser.parse_args()
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": [],
+    }
+    for rows in args.sizes:
+        report["results"].extend(bench_helpers(rows))
+        for batch in args.batches:
+            report["results"].extend(bench_update(rows, batch))
+
+    for r in report["results"]:
+        extra = f" batch={r['batch']:<5} per_event={r['per_event_ms']:.3f}ms" if r["kind"] == "update" else ""
+        print(f"{r['name']:<36} rows={r['rows']:<6} {r['seconds'] * 1000:10.3f}ms{extra}")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"报告已写入: {args.out}")
+
+    if args.baseline and compare(report, args.baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
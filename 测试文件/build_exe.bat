@@ -7,7 +7,7 @@ echo        AutoHyperlink Build Script
 echo ========================================================
 
 echo [1/4] Installing dependencies...
-pip install pyinstaller watchdog pywin32 pillow
+pip install pyinstaller watchdog pywin32 pillow xlrd xlwt xlutils
 
 echo [2/4] Building AutoHyperlink.exe (Silent Mode + Icon)...
 pyinstaller --noconfirm --onefile --noconsole ^
@@ -25,9 +25,12 @@ pyinstaller --noconfirm --onefile --noconsole ^
     --icon "monitor.ico" ^
     --hidden-import=win32com.client ^
     --hidden-import=pythoncom ^
+    --hidden-import=pywintypes ^
+    --hidden-import=watchdog ^
     "folder_monitor.py"
 
-echo [4/4] Cleaning up...
+echo [4/4] Copying rules and cleaning up...
+copy /Y "autohyperlink_rules.json" "dist\autohyperlink_rules.json" >nul
 if exist build rmdir /s /q build 2>nul
 if exist build (
   timeout /t 2 /nobreak >nul
@@ -40,12 +43,14 @@ echo.
 echo ========================================================
 echo Build Complete!
 echo Executables location: %~dp0dist\
-echo   - AutoHyperlink.exe (Same Icon as FolderMonitor)
-echo   - FolderMonitor.exe
+echo   - AutoHyperlink.exe (Same Icon as FolderMonitor, standalone watcher)
+echo   - FolderMonitor.exe (watcher built in, paused while the folder is closed)
+echo   - autohyperlink_rules.json (editable rules, reloaded automatically)
 echo ========================================================
 echo Usage:
-echo 1. Copy BOTH files to the folder you want to monitor.
+echo 1. Copy FolderMonitor.exe and autohyperlink_rules.json to the folder you want to monitor.
 echo 2. Run FolderMonitor.exe ONCE.
-echo 3. It will auto-start AutoHyperlink.exe when you open the folder.
+echo 3. It resumes monitoring when you open the folder and pauses when you close it.
+echo    (Or run AutoHyperlink.exe instead to monitor all the time.)
 echo ========================================================
 if not defined NOPAUSE pause
@@ -0,0 +1,55 @@
+import os
+import re
+from functools import lru_cache
+
+# 缓存多少个文件名的解析结果
+CACHE_SIZE = 8192
+
+# 文号：机关代字〔2025〕12号 / 【2025】12号 / [2025]12号，年份括号两种写法一次匹配
+_BRACKETED = re.compile(
+    r"([^\s（）()]*?(?:([〔【])\s*20\d{2}\s*[〕】]|\[\s*20\d{2}\s*\])\s*\d+\s*号)"
+)
+# 只认〔〕【】：文件名中 [] 写法出现在前面时，仍以〔〕【】的文号为准
+_CJK_BRACKETED = re.compile(r"([^\s（）()]*?[〔【]\s*20\d{2}\s*[〕】]\s*\d+\s*号)")
+# 兜底：括号里以“号”结尾且含年份，如（惠电段安发2025-4号）
+_PARENTHESIZED = re.compile(r"[（(]([^）)]+号)[)）]")
+_YEAR = re.compile(r"20\d{2}")
+
+
+def normalize_doc_no(v):
+    """去掉所有空白，用于比较文号"""
+    return "".join(str(v or "").split())
+
+
+def _extract(stem):
+    if "号" not in stem or "20" not in stem:
+        # 所有文号写法都同时含“号”和年份，绝大多数普通文件名在这里返回
+        return ""
+    m = _BRACKETED.search(stem)
+    if m:
+        if not m.group(2):
+            cjk = _CJK_BRACKETED.search(stem, m.start())
+            if cjk:
+                return normalize_doc_no(cjk.group(1))
+        return normalize_doc_no(m.group(1))
+    m = _PARENTHESIZED.search(stem)
+    if m:
+        inner = m.group(1).strip()
+        if _YEAR.search(inner):
+            return normalize_doc_no(inner)
+    return ""
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def extract_doc_no(text):
+    """从文件名（或去掉扩展名的文件名）中提取文号，找不到时返回空串"""
+    return _extract(os.path.splitext(text)[0])
+
+
+def extract_doc_nos(texts):
+    """批量版本：一次调用处理一组文件名，重复的文件名只解析一次"""
+    seen = {}
+    for text in texts:
+        if text not in seen:
+            seen[text] = extract_doc_no(text)
+    return [seen[text] for text in texts]
@@ -0,0 +1,209 @@
+import os
+import queue
+import threading
+import time
+
+# 最后一个事件之后静默多久才提交（秒）
+BATCH_QUIET_SECONDS = 1.0
+# 单批最多积攒多少个事件，达到后立即提交
+BATCH_MAX_SIZE = 200
+# 推迟重试的退避：首次等待秒数、上限秒数
+DEFER_BASE_SECONDS = 1.0
+DEFER_MAX_SECONDS = 60.0
+# 普通异常最多尝试几次（被锁定的推迟不计次数）
+MAX_ATTEMPTS = 8
+
+
+class DeferBatch(Exception):
+    """Raised by ``apply_batch`` when the target is busy (e.g. the workbook
+    is open elsewhere): the items are parked and retried later without
+    counting as a failed attempt."""
+
+
+class EventBatcher:
+    """Coalesces file events into per-workbook batches.
+
+    ``submit(key, item)`` queues an item under ``key`` (the target workbook).
+    Once no new item has arrived for that key for ``quiet_seconds``, or
+    ``max_batch`` items are waiting for it, the key's items are handed to
+    ``apply_batch(key, items)`` in arrival order; a busy key does not hold
+    back a quiet one.
+
+    Every key has its own worker thread, so a slow or locked workbook never
+    holds up another one. A key has at most one batch in flight; items that
+    arrive meanwhile wait and go out together in the next batch, which keeps
+    per-key ordering.
+
+    A key whose batch fails is parked with per-key exponential backoff;
+    items submitted for it meanwhile join the parked ones and everything is
+    retried together in one batch, while other keys keep flowing. Plain
+    exceptions give up after ``max_attempts``; ``DeferBatch`` never does.
+    """
+
+    def __init__(self, apply_batch, quiet_seconds=BATCH_QUIET_SECONDS, max_batch=BATCH_MAX_SIZE,
+                 defer_base=DEFER_BASE_SECONDS, defer_max=DEFER_MAX_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self._apply_batch = apply_batch
+        self.quiet_seconds = quiet_seconds
+        self.max_batch = max_batch
+        self.defer_base = defer_base
+        self.defer_max = defer_max
+        self.max_attempts = max_attempts
+        self._pending = {}
+        self._deferred = {}  # key -> {"items", "retry_at", "delays", "attempts"}
+        self._count = 0
+        self._last_event = {}  # key -> 最近一次提交的时间
+        self._cond = threading.Condition()
+        self._running = set()
+        self._workers = {}  # key -> (thread, job queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="EventBatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, key, item):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("EventBatcher 已关闭")
+            parked = self._deferred.get(key)
+            if parked is not None:
+                # 等待重试的工作簿：并入推迟队列，到期后与之前的事件一起处理
+                parked["items"].append(item)
+                return
+            self._pending.setdefault(key, []).append(item)
+            self._count += 1
+            self._last_event[key] = time.time()
+            self._cond.notify_all()
+
+    def pending_count(self):
+        with self._cond:
+            return self._count + sum(len(d["items"]) for d in self._deferred.values())
+
+    def deferred_keys(self):
+        with self._cond:
+            return list(self._deferred)
+
+    def worker_names(self):
+        with self._cond:
+            return [thread.name for thread, _ in self._workers.values()]
+
+    def drain(self, timeout=None):
+        """Apply everything queued so far and wait until it is done.
+
+        Parked keys are retried once right away; if they are still busy they
+        stay parked and do not hold up the drain.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            self._last_event.clear()
+            for parked in self._deferred.values():
+                parked["retry_at"] = 0.0
+            self._cond.notify_all()
+            while self._count or self._running or self._due_keys(0.0):
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _due_keys(self, now):
+        return [k for k, d in self._deferred.items() if d["retry_at"] <= now]
+
+    def _ready_keys(self, now):
+        # 调用方持有 self._cond
+        keys = [k for k, items in self._pending.items() if k not in self._running and (
+            self._closed or len(items) >= self.max_batch or self._quiet_until(k) <= now)]
+        for key, parked in self._deferred.items():
+            # 关闭时把推迟的工作簿也再试一次
+            if key not in self._running and (self._closed or parked["retry_at"] <= now):
+                keys.append(key)
+        return keys
+
+    def _quiet_until(self, key):
+        # 调用方持有 self._cond
+        return self._last_event.get(key, 0.0) + self.quiet_seconds
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.time()
+                    ready = self._ready_keys(now)
+                    if ready:
+                        break
+                    if self._closed and not self._pending and not self._deferred and not self._running:
+                        workers, self._workers = list(self._workers.values()), {}
+                        break
+                    waits = [d["retry_at"] - now for k, d in self._deferred.items() if k not in self._running]
+                    waits.extend(self._quiet_until(k) - now for k in self._pending if k not in self._running)
+                    self._cond.wait(max(min(waits), 0.01) if waits else None)
+                if not ready:
+                    break
+                for key in ready:
+                    parked = self._deferred.pop(key, None)
+                    items = self._pending.pop(key, [])
+                    self._last_event.pop(key, None)
+                    self._count -= len(items)
+                    if parked is not None:
+                        items = parked["items"] + items
+                    self._running.add(key)
+                    self._worker(key).put((items, parked))
+        for thread, jobs in workers:
+            jobs.put(None)
+            thread.join()
+
+    def _worker(self, key):
+        # 调用方持有 self._cond
+        entry = self._workers.get(key)
+        if entry is None:
+            jobs = queue.Queue()
+            name = f"EventBatcher-{os.path.basename(str(key))}"
+            thread = threading.Thread(target=self._work, args=(key, jobs), name=name, daemon=True)
+            thread.start()
+            entry = self._workers[key] = (thread, jobs)
+        return entry[1]
+
+    def _work(self, key, jobs):
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            items, parked = job
+            try:
+                self._apply_batch(key, items)
+            except DeferBatch as e:
+                self._park(key, items, parked, e, count_attempt=False)
+            except Exception as e:
+                self._park(key, items, parked, e, count_attempt=True)
+            finally:
+                with self._cond:
+                    self._running.discard(key)
+                    self._cond.notify_all()
+
+    def _park(self, key, items, previous, error, count_attempt):
+        with self._cond:
+            delays = previous["delays"] + 1 if previous else 0
+            attempts = (previous["attempts"] if previous else 0) + (1 if count_attempt else 0)
+            if count_attempt and attempts >= self.max_attempts:
+                print(f"批量处理失败，已放弃 {len(items)} 个事件: {key}: {error}")
+                return
+            if self._closed:
+                print(f"退出时仍无法处理 {len(items)} 个事件: {key}: {error}")
+                return
+            delay = min(self.defer_base * (2 ** delays), self.defer_max)
+            # 处理期间新到的同一工作簿事件排在后面，一并推迟
+            newer = self._pending.pop(key, [])
+            self._last_event.pop(key, None)
+            self._count -= len(newer)
+            items = items + newer
+            self._deferred[key] = {
+                "items": items,
+                "retry_at": time.time() + delay,
+                "delays": delays,
+                "attempts": attempts,
+            }
+            print(f"推迟处理 {len(items)} 个事件（{delay:.1f}s 后重试）: {key}: {error}")
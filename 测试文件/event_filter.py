@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# 同一最终路径在多少秒内的重复事件只保留第一个
+DEDUP_WINDOW = 5.0
+
+
+class EventFilter:
+    """Pre-filter between the observer and the workbook path.
+
+    ``accept(path)`` drops names the (compiled) ignore rules reject and any
+    repeat of the same final path within ``window`` seconds, e.g. the
+    created + moved pair of a copy or the temp-rename dance of an Office/WPS
+    save, so the batcher sees one event per real file. ``forget(path)``
+    lets the next event for a deleted path through. ``cover(directory)``
+    drops every event under a directory that is being handled as a whole
+    (a new or moved tree), until ``uncover`` or for ``seconds``; a moved
+    file is also dropped when its ``src`` is covered.
+    ``counts()`` returns how many events were accepted and dropped, by
+    reason.
+    """
+
+    def __init__(self, is_ignored, window=DEDUP_WINDOW):
+        self.is_ignored = is_ignored
+        self.window = window
+        # 路径 -> 最近一次放行的时间，按时间先后排列，过期的从前端清理
+        self._recent = OrderedDict()
+        # 整体处理中的目录 -> 到期时间（None 表示直到 uncover）
+        self._covered = {}
+        self._counts = {"accepted": 0, "ignored": 0, "duplicate": 0, "covered": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def accept(self, path, src=None):
+        if self.is_ignored(os.path.basename(path)):
+            with self._lock:
+                self._counts["ignored"] += 1
+            return False
+        key = self._key(path)
+        now = time.monotonic()
+        with self._lock:
+            if self._covered_locked(key, src, now):
+                return False
+            cutoff = now - self.window
+            while self._recent:
+                oldest, seen = next(iter(self._recent.items()))
+                if seen > cutoff:
+                    break
+                del self._recent[oldest]
+            if key in self._recent:
+                self._counts["duplicate"] += 1
+                return False
+            self._recent[key] = now
+            self._counts["accepted"] += 1
+            return True
+
+    def covers(self, path, src=None):
+        """目录事件用：位于整体处理中的目录下时返回 True（计入 covered）"""
+        with self._lock:
+            return self._covered_locked(self._key(path), src, time.monotonic())
+
+    def _covered_locked(self, key, src, now):
+        # 调用方持有 self._lock
+        if self._covered and (
+            self._is_covered(key, now) or (src is not None and self._is_covered(self._key(src), now))
+        ):
+            self._counts["covered"] += 1
+            return True
+        return False
+
+    def _is_covered(self, key, now):
+        # 调用方持有 self._lock
+        for directory, expires in list(self._covered.items()):
+            if expires is not None and expires <= now:
+                del self._covered[directory]
+            elif key.startswith(directory + os.sep):
+                return True
+        return False
+
+    def cover(self, directory, seconds=None):
+        with self._lock:
+            self._covered[self._key(directory)] = None if seconds is None else time.monotonic() + seconds
+
+    def uncover(self, directory):
+        with self._lock:
+            self._covered.pop(self._key(directory), None)
+
+    def forget(self, path):
+        with self._lock:
+            self._recent.pop(self._key(path), None)
+
+    def counts(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def dropped(self):
+        with self._lock:
+            return sum(n for reason, n in self._counts.items() if reason != "accepted")
@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import threading
+import time
+
+# 组提交：第一条未提交记录最多等待多久就写盘（秒）
+COMMIT_INTERVAL = 0.05
+# 日志文件名前缀，监控与补登扫描都会忽略这些文件
+JOURNAL_PREFIX = ".autohyperlink_journal"
+
+
+class EventJournal:
+    """Durable record of accepted file events, in a local SQLite file.
+
+    ``append`` assigns an id and returns at once; a background thread
+    commits everything appended within ``commit_interval`` in one
+    transaction (group commit), and ``flush`` forces that commit. Entries
+    are deleted by ``mark_done`` once the workbook save succeeded, so
+    whatever is left in the file at startup is replayed via ``pending``.
+    """
+
+    def __init__(self, path, commit_interval=COMMIT_INTERVAL):
+        self.path = path
+        self.commit_interval = commit_interval
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "id INTEGER PRIMARY KEY, created REAL, workbook TEXT, path TEXT, kind TEXT, src TEXT)"
+        )
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(events)")]
+        if "src" not in columns:
+            # 旧版本的日志文件：补上改名前路径一列
+            self._db.execute("ALTER TABLE events ADD COLUMN src TEXT")
+        self._next_id = (self._db.execute("SELECT MAX(id) FROM events").fetchone()[0] or 0) + 1
+        self._appended = []
+        self._done = []
+        self._cond = threading.Condition()
+        self._db_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="EventJournal", daemon=True)
+        self._thread.start()
+
+    def append(self, workbook, path, kind="created", src=None):
+        with self._cond:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._appended.append((entry_id, time.time(), workbook, path, kind, src))
+            self._cond.notify_all()
+        return entry_id
+
+    def mark_done(self, ids):
+        ids = [i for i in ids if i is not None]
+        if not ids:
+            return
+        with self._cond:
+            self._done.extend(ids)
+            self._cond.notify_all()
+
+    def flush(self):
+        with self._cond:
+            appended, self._appended = self._appended, []
+            done, self._done = self._done, []
+        if not appended and not done:
+            return
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?)", appended)
+                self._db.executemany("DELETE FROM events WHERE id = ?", [(i,) for i in done])
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                with self._cond:
+                    self._appended[:0] = appended
+                    self._done[:0] = done
+                raise
+
+    def pending(self):
+        """Unfinished entries as ``(id, workbook, path, kind, src)``, oldest first."""
+        self.flush()
+        with self._db_lock:
+            return self._db.execute("SELECT id, workbook, path, kind, src FROM events ORDER BY id").fetchall()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self.flush()
+        with self._db_lock:
+            self._db.close()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._appended and not self._done and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            # 攒一小段时间，让这段时间内到达的事件共用一次提交
+            time.sleep(self.commit_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"事件日志写入失败: {e}")
+                time.sleep(1)
+
+
+def journal_path(directory):
+    return os.path.join(directory, JOURNAL_PREFIX + ".db")
@@ -0,0 +1,108 @@
+import os
+
+from workbook_host import WorkbookHost
+
+
+class FakeWorkbook:
+    def __init__(self, factory, path):
+        self._factory = factory
+        self.FullName = os.path.abspath(path)
+        self.Name = os.path.basename(path)
+        self.closed = False
+
+    def Save(self):
+        self._factory.saves += 1
+
+    def Close(self, SaveChanges=False):
+        if SaveChanges:
+            self._factory.saves += 1
+        self.closed = True
+
+
+class FakeWorkbooks:
+    def __init__(self, factory):
+        self._factory = factory
+        self._open = []
+
+    @property
+    def Count(self):
+        return len(self._open)
+
+    def Open(self, path, UpdateLinks=0, ReadOnly=False):
+        self._factory.opens += 1
+        wb = self._factory.workbook_factory(self._factory, path)
+        self._open.append(wb)
+        return wb
+
+
+class FakeExcelApplication:
+    def __init__(self, factory):
+        self.Visible = True
+        self.DisplayAlerts = True
+        self.Workbooks = FakeWorkbooks(factory)
+        self._factory = factory
+
+    def Quit(self):
+        self._factory.quits += 1
+
+
+class CountingExcelFactory:
+    """Stand-in for the Excel launch in ``ExcelWorkbookHost``.
+
+    Counts how many applications were launched, workbooks opened, saves and
+    quits, so session behaviour can be checked without Excel.
+    """
+
+    def __init__(self, workbook_factory=FakeWorkbook):
+        self.workbook_factory = workbook_factory
+        self.launches = 0
+        self.opens = 0
+        self.saves = 0
+        self.quits = 0
+
+    def __call__(self):
+        self.launches += 1
+        app = FakeExcelApplication(self)
+        app.Visible = False
+        app.DisplayAlerts = False
+        return app
+
+
+CATALOG_HEADERS = ["序号", "收文日期", "文号", "文件名", "自编号", "传阅方式", "存盒位置", "备注"]
+
+
+def make_catalog_workbook(path, rows, sheet_names=("上级文电", "行政函", "事项通知", "其他及调度命令"), year_full="2025"):
+    """In-memory catalog shaped like 20xx工区收文目录.xls: a title row, the
+    header row and ``rows`` filled records on every sheet."""
+    from memory_workbook import MemoryWorkbook
+
+    wb = MemoryWorkbook(path)
+    for name in sheet_names:
+        data = [(f"工区收文目录（{name}）",), tuple(CATALOG_HEADERS)]
+        for i in range(1, rows + 1):
+            doc_no = f"测函〔{year_full}〕{i}号"
+            data.append((i, f"{year_full}.01.02", doc_no, f"（{doc_no}）测试文件{i}.pdf", f"SJW-{year_full}-{i}", "电子传阅", "", ""))
+        wb.add_sheet(name, data)
+    return wb
+
+
+class FakeWorkbookHost(WorkbookHost):
+    """WorkbookHost over in-memory workbooks: no Excel, no files.
+
+    Register workbooks with ``add``; ``runs`` counts sessions.
+    """
+
+    def __init__(self):
+        self.workbooks = {}
+        self.runs = 0
+
+    def add(self, wb):
+        self.workbooks[os.path.normcase(wb.FullName)] = wb
+        return wb
+
+    def run(self, excel_path, fn):
+        self.runs += 1
+        return fn(self.workbooks[os.path.normcase(os.path.abspath(excel_path))])
+
+    def is_open(self, excel_path):
+        return os.path.normcase(os.path.abspath(excel_path)) in self.workbooks
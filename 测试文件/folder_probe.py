@@ -0,0 +1,206 @@
+import os
+import threading
+import time
+import urllib.parse
+
+# 轮询间隔：状态变化后从最短间隔开始，无变化时逐步加倍到最长间隔（秒）
+MIN_INTERVAL = 0.25
+MAX_INTERVAL = 2.0
+# 窗口数量不变时，最多隔多久完整枚举一次窗口路径（在已有窗口里切换目录不会改变窗口数量）
+FULL_SCAN_INTERVAL = 8.0
+
+
+def norm_path(p):
+    try:
+        return os.path.normcase(os.path.normpath(os.path.abspath(p)))
+    except Exception:
+        return p
+
+
+def is_under(path, folder):
+    """path 是 folder 本身或其子目录（均为 norm_path 之后的形式）"""
+    return path == folder or path.startswith(folder.rstrip(os.sep) + os.sep)
+
+
+class FolderProbe:
+    """Tells which folders are open in the file manager.
+
+    ``signature()`` is a cheap value that changes whenever the set of open
+    windows may have changed (None when the probe has nothing cheaper than
+    a full scan); ``open_paths()`` does the full scan and returns normalized
+    paths.
+    """
+
+    def signature(self):
+        return None
+
+    def open_paths(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ShellWindowsProbe(FolderProbe):
+    """Explorer windows through one persistent ``Shell.Application`` object.
+
+    COM is initialized once, on the first call, in the calling thread; use
+    the probe from that thread only. The signature is the window count, a
+    single COM call.
+    """
+
+    def __init__(self):
+        self._shell = None
+        self._com = False
+
+    def _windows(self):
+        if self._shell is None:
+            import pythoncom
+            import win32com.client
+            if not self._com:
+                pythoncom.CoInitialize()
+                self._com = True
+            self._shell = win32com.client.Dispatch("Shell.Application")
+        return self._shell.Windows()
+
+    def signature(self):
+        try:
+            return self._windows().Count
+        except Exception:
+            # Explorer 重启等情况：下次重新创建 Shell.Application
+            self._shell = None
+            return None
+
+    def open_paths(self):
+        paths = set()
+        try:
+            windows = self._windows()
+        except Exception:
+            self._shell = None
+            return paths
+        for window in windows:
+            try:
+                url = window.LocationURL
+                if url and url.startswith("file:///"):
+                    paths.add(norm_path(urllib.parse.unquote(url[8:])))
+            except Exception:
+                continue
+        return paths
+
+    def close(self):
+        self._shell = None
+        if self._com:
+            try:
+                import pythoncom
+                pythoncom.CoUninitialize()
+            except Exception:
+                pass
+            self._com = False
+
+
+class FakeProbe(FolderProbe):
+    """Probe driven by the test: ``open(path)`` / ``close_folder(path)``.
+
+    Counts ``signatures`` and ``scans`` so tests can check how much polling
+    a supervisor does; works on any platform.
+    """
+
+    def __init__(self, paths=()):
+        self._paths = {norm_path(p) for p in paths}
+        self._version = 0
+        self._lock = threading.Lock()
+        self.signatures = 0
+        self.scans = 0
+
+    def open(self, path):
+        with self._lock:
+            self._paths.add(norm_path(path))
+            self._version += 1
+
+    def close_folder(self, path):
+        with self._lock:
+            self._paths.discard(norm_path(path))
+            self._version += 1
+
+    def signature(self):
+        with self._lock:
+            self.signatures += 1
+            return self._version
+
+    def open_paths(self):
+        with self._lock:
+            self.scans += 1
+            return set(self._paths)
+
+
+def default_probe():
+    # Windows 上用常驻的 Shell.Application；其他平台没有可用的探测方式
+    try:
+        import win32com.client  # noqa: F401
+    except ImportError:
+        raise RuntimeError("需要 pywin32（Windows）才能检测资源管理器窗口；测试请使用 FakeProbe")
+    return ShellWindowsProbe()
+
+
+class FolderWatch:
+    """Adaptive polling of one folder's open/closed state.
+
+    Each tick reads the probe's cheap signature; the full scan runs only
+    when the signature changed or ``full_scan_interval`` has passed. The
+    tick interval doubles from ``min_interval`` to ``max_interval`` while
+    nothing changes and drops back to the minimum after a change.
+    ``wait_for_change`` returns only when the folder's state flips (or on
+    timeout), so the caller sleeps the rest of the time.
+    """
+
+    def __init__(self, probe, folder, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                 full_scan_interval=FULL_SCAN_INTERVAL):
+        self.probe = probe
+        self.folder = norm_path(folder)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.full_scan_interval = full_scan_interval
+        self._interval = min_interval
+        self._signature = object()
+        self._next_full = 0.0
+        self._stop = threading.Event()
+        self.is_open = self._scan()
+
+    def _scan(self):
+        self._next_full = time.monotonic() + self.full_scan_interval
+        return any(is_under(p, self.folder) for p in self.probe.open_paths())
+
+    def poll(self):
+        """One tick; returns the current open state."""
+        signature = self.probe.signature()
+        changed = signature is None or signature != self._signature
+        self._signature = signature
+        if changed or time.monotonic() >= self._next_full:
+            is_open = self._scan()
+            if is_open != self.is_open:
+                changed = True
+            self.is_open = is_open
+        self._interval = self.min_interval if changed else min(self._interval * 2, self.max_interval)
+        return self.is_open
+
+    def wait_for_change(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        before = self.is_open
+        while not self._stop.is_set():
+            wait = self._interval
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    break
+            if self._stop.wait(wait):
+                break
+            if self.poll() != before:
+                break
+        return self.is_open
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def stop(self):
+        self._stop.set()
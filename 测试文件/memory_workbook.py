@@ -0,0 +1,259 @@
+import os
+
+
+def _cell_value(value):
+    # 与 Excel COM 保持一致：写入空串即清空单元格，整数读回为浮点数
+    if value == "":
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+class MemoryHyperlink:
+    def __init__(self, address, text, sub_address="", anchor=None):
+        self.Address = address
+        self.TextToDisplay = text
+        self.SubAddress = sub_address
+        # 所在单元格，与 COM 的 Hyperlink.Range 一致
+        self.Range = anchor
+
+
+class MemoryHyperlinks:
+    """``ws.Hyperlinks`` / ``cell.Hyperlinks`` of the in-memory object model."""
+
+    def __init__(self, ws, cells=None):
+        self._ws = ws
+        self._cells = cells
+
+    def _keys(self):
+        if self._cells is None:
+            return sorted(self._ws.links)
+        return [k for k in self._cells if k in self._ws.links]
+
+    @property
+    def Count(self):
+        return len(self._keys())
+
+    def __call__(self, i):
+        return self._ws.links[self._keys()[i - 1]]
+
+    def __iter__(self):
+        return iter([self._ws.links[k] for k in self._keys()])
+
+    def Add(self, Anchor, Address, SubAddress="", ScreenTip="", TextToDisplay=None):
+        self._ws.calls["Hyperlinks.Add"] += 1
+        key = (Anchor.Row, Anchor.Column)
+        text = TextToDisplay if TextToDisplay is not None else Address
+        self._ws.links[key] = MemoryHyperlink(Address, text, SubAddress, MemoryRange(self._ws, *key, *key))
+        self._ws.set_value(key[0], key[1], text)
+        return self._ws.links[key]
+
+    def Delete(self):
+        for key in self._keys():
+            del self._ws.links[key]
+            self._ws.dirty.add(key)
+
+
+class _Count:
+    def __init__(self, n):
+        self.Count = n
+
+
+class MemoryRange:
+    """Rectangular range; a single cell is a 1x1 range, as in COM."""
+
+    def __init__(self, ws, r1, c1, r2, c2):
+        self._ws = ws
+        self.Row = r1
+        self.Column = c1
+        self._r2 = r2
+        self._c2 = c2
+
+    @property
+    def Rows(self):
+        return _Count(self._r2 - self.Row + 1)
+
+    @property
+    def Columns(self):
+        return _Count(self._c2 - self.Column + 1)
+
+    def _cells(self):
+        return [(r, c) for r in range(self.Row, self._r2 + 1) for c in range(self.Column, self._c2 + 1)]
+
+    @property
+    def Value(self):
+        self._ws.calls["Value.get"] += 1
+        get = self._ws.cells.get
+        if self.Row == self._r2 and self.Column == self._c2:
+            return get((self.Row, self.Column))
+        return tuple(
+            tuple(get((r, c)) for c in range(self.Column, self._c2 + 1))
+            for r in range(self.Row, self._r2 + 1)
+        )
+
+    @Value.setter
+    def Value(self, value):
+        self._ws.calls["Value.set"] += 1
+        if not isinstance(value, (tuple, list)):
+            for r, c in self._cells():
+                self._ws.set_value(r, c, value)
+            return
+        for i, row in enumerate(value):
+            for j, v in enumerate(row):
+                self._ws.set_value(self.Row + i, self.Column + j, v)
+
+    @property
+    def Hyperlinks(self):
+        return MemoryHyperlinks(self._ws, self._cells())
+
+    @property
+    def Formula(self):
+        link = self._ws.links.get((self.Row, self.Column))
+        if link is not None:
+            return f'=HYPERLINK("{link.Address}","{link.TextToDisplay}")'
+        value = self._ws.cells.get((self.Row, self.Column))
+        return "" if value is None else str(value)
+
+
+class MemoryColumn:
+    def __init__(self, ws, c):
+        self._ws = ws
+        self._c = c
+
+    @property
+    def ColumnWidth(self):
+        return self._ws.col_widths.get(self._c, 8.43)
+
+    @ColumnWidth.setter
+    def ColumnWidth(self, value):
+        self._ws.col_widths[self._c] = value
+
+
+class MemoryWorksheet:
+    """Worksheet holding values and hyperlinks in dicts keyed by (row, col).
+
+    Exposes the subset of the Excel COM surface the updater uses:
+    ``Name``, ``Cells``, ``Range``, ``UsedRange``, ``Hyperlinks`` and
+    ``Columns``. ``calls`` counts cell accesses, reads, writes and
+    hyperlink adds, i.e. what would be COM round trips against Excel.
+    """
+
+    def __init__(self, name, rows=None):
+        self.Name = name
+        self.cells = {}
+        self.links = {}
+        self.col_widths = {}
+        self.dirty = set()
+        self.calls = {"Cells": 0, "Value.get": 0, "Value.set": 0, "Hyperlinks.Add": 0}
+        self._min_row = self._min_col = None
+        self._max_row = self._max_col = 0
+        for r, row in enumerate(rows or (), 1):
+            for c, v in enumerate(row, 1):
+                self.load_value(r, c, v)
+
+    def load_value(self, r, c, value):
+        # 加载原始内容，不计入待保存的修改
+        value = _cell_value(value)
+        if value is None:
+            return
+        self.cells[(r, c)] = value
+        self._extend(r, c)
+
+    def set_value(self, r, c, value):
+        value = _cell_value(value)
+        if value is None:
+            self.cells.pop((r, c), None)
+        else:
+            self.cells[(r, c)] = value
+            self._extend(r, c)
+        self.dirty.add((r, c))
+
+    def _extend(self, r, c):
+        self._min_row = r if self._min_row is None else min(self._min_row, r)
+        self._min_col = c if self._min_col is None else min(self._min_col, c)
+        self._max_row = max(self._max_row, r)
+        self._max_col = max(self._max_col, c)
+
+    def Cells(self, r, c):
+        self.calls["Cells"] += 1
+        return MemoryRange(self, r, c, r, c)
+
+    def Range(self, first, last=None):
+        last = last or first
+        return MemoryRange(
+            self,
+            min(first.Row, last.Row), min(first.Column, last.Column),
+            max(first.Row, last.Row), max(first.Column, last.Column),
+        )
+
+    @property
+    def UsedRange(self):
+        if self._min_row is None:
+            return MemoryRange(self, 1, 1, 1, 1)
+        return MemoryRange(self, self._min_row, self._min_col, self._max_row, self._max_col)
+
+    @property
+    def Hyperlinks(self):
+        return MemoryHyperlinks(self)
+
+    def Columns(self, c):
+        return MemoryColumn(self, c)
+
+
+class MemorySheets:
+    def __init__(self, sheets):
+        self._sheets = sheets
+
+    @property
+    def Count(self):
+        return len(self._sheets)
+
+    def __call__(self, key):
+        if isinstance(key, str):
+            for ws in self._sheets:
+                if ws.Name == key:
+                    return ws
+            raise KeyError(key)
+        return self._sheets[key - 1]
+
+    def __iter__(self):
+        return iter(self._sheets)
+
+
+class MemoryWorkbook:
+    """Workbook made of MemoryWorksheet objects.
+
+    ``Save()`` calls ``_save()``, which subclasses override to persist the
+    workbook (see ``xls_backend.XlsWorkbook``); here it only counts.
+    """
+
+    def __init__(self, path, sheets=None):
+        self.FullName = os.path.abspath(path)
+        self.Name = os.path.basename(path)
+        self.sheets = list(sheets or [])
+        self.Sheets = MemorySheets(self.sheets)
+        self.save_count = 0
+        self.closed = False
+
+    def Worksheets(self, key):
+        return self.Sheets(key)
+
+    def add_sheet(self, name, rows=None):
+        ws = MemoryWorksheet(name, rows)
+        self.sheets.append(ws)
+        return ws
+
+    def Save(self):
+        self._save()
+        self.save_count += 1
+        for ws in self.sheets:
+            ws.dirty.clear()
+
+    def _save(self):
+        pass
+
+    def Close(self, SaveChanges=False):
+        if SaveChanges and any(ws.dirty for ws in self.sheets):
+            self.Save()
+        self.closed = True
@@ -0,0 +1,215 @@
+import bisect
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# 指标写出间隔（秒）
+WRITE_INTERVAL = 60.0
+# JSONL 超过多大就轮转（字节），以及保留几个旧文件（.1 最新）
+ROTATE_BYTES = 5 * 1024 * 1024
+ROTATE_KEEP = 3
+# 指标文件名前缀，监控与补登扫描都会忽略这些文件
+METRICS_PREFIX = ".autohyperlink_metrics"
+# 耗时直方图的桶上限（秒）；超过最后一个的计入 +Inf
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+# Prometheus 指标名前缀
+PROM_PREFIX = "autohyperlink"
+
+
+class Histogram:
+    """Fixed-bucket latency histogram: one ``bisect`` and three adds per
+    observation, no per-sample storage."""
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        # 按桶估计：返回第一个累计数达到 q 的桶上限（落在 +Inf 时用最大值）
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """In-process counters, gauges and per-stage latency histograms.
+
+    ``inc(name)`` and ``observe(stage, seconds)`` (or ``with
+    timer(stage):``) cost one lock and a few adds, cheap enough to stay on
+    in production. ``gauge(name, fn)`` registers a callable (e.g. a queue
+    depth) that is only sampled by ``snapshot()``. Everything is cumulative
+    since start, like Prometheus counters.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._counters = {}
+        self._stages = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def observe(self, stage, seconds):
+        seconds = max(0.0, seconds)
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                hist = self._stages[stage] = Histogram()
+            hist.observe(seconds)
+
+    def timer(self, stage):
+        return _Timer(self, stage)
+
+    def gauge(self, name, fn):
+        with self._lock:
+            self._gauges[name] = fn
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            stages = {
+                stage: {"count": h.count, "sum": h.sum, "max": h.max, "buckets": list(h.counts),
+                        "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99)}
+                for stage, h in self._stages.items()
+            }
+            gauges = list(self._gauges.items())
+        values = {}
+        for name, fn in gauges:
+            try:
+                values[name] = fn()
+            except Exception:
+                # 采样失败（如会话已关闭）时本次不写该项
+                pass
+        return {"time": time.time(), "uptime": time.time() - self.started,
+                "counters": counters, "gauges": values, "stages": stages}
+
+
+def to_prometheus(snapshot, prefix=PROM_PREFIX):
+    """Prometheus text exposition format (version 0.0.4) of a snapshot."""
+    lines = []
+    for name, value in sorted(snapshot["counters"].items()):
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        lines.append(f"{prefix}_{name}_total {value}")
+    for name, value in sorted(snapshot["gauges"].items()):
+        lines.append(f"# TYPE {prefix}_{name} gauge")
+        lines.append(f"{prefix}_{name} {value}")
+    if snapshot["stages"]:
+        family = f"{prefix}_stage_seconds"
+        lines.append(f"# TYPE {family} histogram")
+        for stage, h in sorted(snapshot["stages"].items()):
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (None,), h["buckets"]):
+                cumulative += n
+                le = "+Inf" if bound is None else repr(bound)
+                lines.append(f'{family}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{family}_sum{{stage="{stage}"}} {h["sum"]:.6f}')
+            lines.append(f'{family}_count{{stage="{stage}"}} {h["count"]}')
+    lines.append(f"# TYPE {prefix}_uptime_seconds gauge")
+    lines.append(f"{prefix}_uptime_seconds {snapshot['uptime']:.1f}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsWriter:
+    """Writes ``metrics.snapshot()`` every ``interval`` seconds to
+    ``<prefix>.jsonl`` (one line per snapshot, rotated at ``rotate_bytes``
+    keeping ``keep`` old files) and ``<prefix>.prom`` (Prometheus text,
+    replaced atomically, for a node_exporter textfile collector or a
+    quick look). ``close()`` writes a final snapshot.
+    """
+
+    def __init__(self, metrics, directory, interval=WRITE_INTERVAL,
+                 rotate_bytes=ROTATE_BYTES, keep=ROTATE_KEEP):
+        self.metrics = metrics
+        self.interval = interval
+        self.rotate_bytes = rotate_bytes
+        self.keep = keep
+        self.jsonl_path = os.path.join(directory, METRICS_PREFIX + ".jsonl")
+        self.prom_path = os.path.join(directory, METRICS_PREFIX + ".prom")
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="MetricsWriter", daemon=True)
+        self._thread.start()
+
+    def write(self):
+        try:
+            with self._write_lock:
+                self._write()
+        except Exception as e:
+            # 指标只是辅助信息，写不出（磁盘满、被占用）时不影响监控
+            print(f"指标写入失败: {e}")
+
+    def _write(self):
+        snapshot = self.metrics.snapshot()
+        record = dict(snapshot, time=datetime.fromtimestamp(snapshot["time"]).isoformat(timespec="seconds"))
+        # JSONL 里只留分位数，桶计数写在 .prom 中
+        record["stages"] = {stage: {k: v for k, v in h.items() if k != "buckets"}
+                            for stage, h in snapshot["stages"].items()}
+        self._rotate()
+        with open(self.jsonl_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        tmp = self.prom_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+            f.write(to_prometheus(snapshot))
+        os.replace(tmp, self.prom_path)
+
+    def _rotate(self):
+        try:
+            if os.path.getsize(self.jsonl_path) < self.rotate_bytes:
+                return
+        except OSError:
+            return
+        for i in range(self.keep - 1, 0, -1):
+            older = f"{self.jsonl_path}.{i}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.jsonl_path}.{i + 1}")
+        if self.keep > 0:
+            os.replace(self.jsonl_path, f"{self.jsonl_path}.1")
+        else:
+            os.remove(self.jsonl_path)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.write()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.write()
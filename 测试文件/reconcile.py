@@ -0,0 +1,83 @@
+import os
+import time
+
+# 扫描时跳过的目录
+SKIP_DIRS = {"__pycache__", "build", "dist", ".git"}
+# 每扫描多少个文件报告一次进度
+PROGRESS_EVERY = 5000
+
+
+def scan_tree(root, route, progress=None, progress_every=PROGRESS_EVERY):
+    """Walk ``root`` with ``os.scandir`` (no recursion, no per-file stat)
+    and group every file by ``route(path)``; files routed to None are
+    ignored. Returns ``({key: [path, ...]}, files_scanned)``.
+    """
+    groups = {}
+    scanned = 0
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            it = os.scandir(directory)
+        except OSError:
+            continue
+        with it:
+            entries = sorted(it, key=lambda e: e.name)
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                if entry.name not in SKIP_DIRS and not entry.name.startswith("."):
+                    stack.append(entry.path)
+                continue
+            scanned += 1
+            if progress and scanned % progress_every == 0:
+                progress(scanned)
+            key = route(entry.path)
+            if key:
+                groups.setdefault(key, []).append(entry.path)
+    return groups, scanned
+
+
+def arrival_order(paths):
+    # 按修改时间排序，使补登的序号/自编号与文件到达顺序一致
+    def key(p):
+        try:
+            return (os.stat(p).st_mtime, p)
+        except OSError:
+            return (0, p)
+    return sorted(paths, key=key)
+
+
+def reconcile(root, route, apply_missing, progress=print):
+    """Catch-up pass for files added while nothing was watching.
+
+    ``route(path)`` names the workbook a file belongs to (or None);
+    ``apply_missing(workbook, paths)`` runs one session on that workbook,
+    registers the paths not yet in its catalog and returns them, or returns
+    None when it queued them for a later retry (e.g. the workbook is
+    locked). Returns ``{workbook: registered_paths}``.
+    """
+    start = time.perf_counter()
+    groups, scanned = scan_tree(
+        root, route,
+        progress=lambda n: progress(f"启动补登：已扫描 {n} 个文件..."),
+    )
+    progress(f"启动补登：扫描 {scanned} 个文件，{sum(len(v) for v in groups.values())} 个属于收文目录，"
+             f"用时 {time.perf_counter() - start:.1f}s")
+    registered = {}
+    for workbook, paths in groups.items():
+        try:
+            added = apply_missing(workbook, paths)
+        except Exception as e:
+            progress(f"启动补登失败: {workbook}: {e}")
+            continue
+        if added is None:
+            progress(f"启动补登：{os.path.basename(workbook)} 被占用，{len(paths)} 个文件稍后重试")
+            continue
+        registered[workbook] = added
+        progress(f"启动补登：{os.path.basename(workbook)} 新增 {len(added)} 条（共检查 {len(paths)} 个文件）")
+    progress(f"启动补登完成，用时 {time.perf_counter() - start:.1f}s")
+    return registered
@@ -0,0 +1,150 @@
+import os
+import re
+import threading
+from collections import namedtuple
+
+# 分类目录名前的编号，如“1-上级文”中的“1-”
+CATEGORY_NUMBER_PATTERN = re.compile(r"^\s*\d+\s*[-－]\s*")
+
+# workbook: 收文目录路径（不存在时为 None）；sheet: 分类名（用于匹配工作表）；
+# prefix: 自编号前缀；year: 两位年份
+Route = namedtuple("Route", "workbook sheet prefix year")
+
+
+def category_label(folder):
+    label = CATEGORY_NUMBER_PATTERN.sub("", folder).strip()
+    return label or folder
+
+
+class RoutingTable:
+    """Directory -> Route lookup for everything under the watched folder.
+
+    Built from the directory tree once at startup; afterwards classifying a
+    file is ``dirname`` plus one dictionary lookup. Directories created or
+    renamed later are added or moved with ``add_dir``/``move_dir`` (a
+    directory the table has not seen is resolved on first use and cached),
+    and ``workbook_changed`` re-checks whether a yearly catalog exists.
+
+    ``rules`` (see rules.py) supplies the year folder pattern, the catalog
+    file name and the 自编号 prefixes; a table is built for one set of
+    rules and replaced when they change.
+    """
+
+    def __init__(self, root, rules):
+        self.root = os.path.abspath(root)
+        self.rules = rules
+        self._routes = {}
+        self._workbooks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def build(self):
+        stack = [self.root]
+        count = 0
+        while stack:
+            directory = stack.pop()
+            self.route_dir(directory)
+            count += 1
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False) and not entry.name.startswith("."):
+                            stack.append(entry.path)
+            except OSError:
+                continue
+        return count
+
+    def _workbook_for_year(self, year):
+        # 调用方持有 self._lock
+        if year not in self._workbooks:
+            path = os.path.join(self.root, self.rules.workbook_name.format(year=year))
+            self._workbooks[year] = path if os.path.exists(path) else None
+        return self._workbooks[year]
+
+    def _resolve(self, directory):
+        # 调用方持有 self._lock
+        rel = os.path.relpath(directory, self.root)
+        if rel == os.curdir or rel.startswith(os.pardir):
+            return None
+        parts = rel.split(os.sep)
+        year_pattern = self.rules.year_folder_pattern
+        folder = next((p for p in parts if year_pattern.match(p)), None)
+        if folder is None:
+            return None
+        # 两位年份取年份目录名的最后两位（允许规则把“2025”也当作年份目录）
+        year = folder[-2:]
+        label = category_label(parts[0])
+        return Route(self._workbook_for_year(year), label, self.rules.prefix_for(label), year)
+
+    def route_dir(self, directory):
+        key = self._key(directory)
+        with self._lock:
+            if key in self._routes:
+                return self._routes[key]
+            route = self._routes[key] = self._resolve(directory)
+            return route
+
+    def route_file(self, file_path):
+        return self.route_dir(os.path.dirname(file_path))
+
+    def add_dir(self, directory):
+        with self._lock:
+            self._routes.pop(self._key(directory), None)
+        return self.route_dir(directory)
+
+    def remove_dir(self, directory):
+        key = self._key(directory)
+        prefix = key + os.sep
+        with self._lock:
+            for k in [k for k in self._routes if k == key or k.startswith(prefix)]:
+                del self._routes[k]
+
+    def is_dir(self, path):
+        """True if ``path`` is a directory the table has routed; Windows
+        reports a deleted directory as a plain file deletion."""
+        with self._lock:
+            return self._key(path) in self._routes
+
+    def workbooks_under(self, directory):
+        """收文目录 of ``directory`` and every known directory below it."""
+        key = self._key(directory)
+        prefix = key + os.sep
+        with self._lock:
+            return {
+                r.workbook for k, r in self._routes.items()
+                if r is not None and r.workbook and (k == key or k.startswith(prefix))
+            }
+
+    def move_dir(self, src, dest):
+        # 只丢弃旧路径及其子目录，新路径下的目录在首次使用时解析
+        self.remove_dir(src)
+        return self.add_dir(dest)
+
+    def workbook_for_year(self, year):
+        with self._lock:
+            return self._workbook_for_year(year)
+
+    def workbook_year(self, filename):
+        """两位年份，若 ``filename`` 是某年的收文目录文件名；否则 None"""
+        m = self.rules.workbook_pattern.match(filename)
+        return m.group(1) if m else None
+
+    def workbook_changed(self, path):
+        # 收文目录被创建、删除或改名时调用；存在与否没变（如每次保存）则什么都不做
+        year = self.workbook_year(os.path.basename(path))
+        if year is None or os.path.dirname(self._key(path)) != self._key(self.root):
+            return
+        with self._lock:
+            exists = os.path.exists(path)
+            if year in self._workbooks and (self._workbooks[year] is not None) == exists:
+                return
+            self._workbooks.pop(year, None)
+            for k in [k for k, r in self._routes.items() if r is not None and r.year == year]:
+                del self._routes[k]
+
+    def workbooks(self):
+        with self._lock:
+            return {year: path for year, path in self._workbooks.items() if path}
@@ -0,0 +1,115 @@
+import json
+import os
+import re
+import threading
+import time
+
+# 规则文件名，放在 exe（或脚本）旁边
+RULES_FILENAME = "autohyperlink_rules.json"
+# 最多每隔多少秒检查一次规则文件的修改时间
+CHECK_INTERVAL = 2.0
+
+# 没有规则文件（或某一项缺失）时使用的默认规则
+DEFAULT_RULES = {
+    # 分类名 -> 自编号前缀；未列出的分类用 default_prefix
+    "category_prefix": {
+        "上级文": "SJW",
+        "其他": "QT",
+        "事项通知": "SXTZ",
+    },
+    "default_prefix": "QT",
+    # 年份目录名（正则，整名匹配）；两位年份取目录名的最后两位
+    "year_folder_pattern": r"\d{2}",
+    # 收文目录文件名，{year} 为两位年份
+    "workbook_name": "20{year}工区收文目录.xls",
+    # 忽略的文件：前缀、后缀、完整文件名（均不区分大小写），以及整名匹配 temp_pattern 的文件
+    # （Excel 保存时把新内容写到 A1B2C3D4 这样的临时名、原文件改名为另一个临时名后删除；
+    # 区分大小写，留空则不按临时名忽略）
+    "ignore": {
+        "prefixes": ["~$"],
+        "suffixes": [".tmp"],
+        "names": ["autohyperlink.exe", "auto_hyperlink.py", "auto_hyperlink.spec", RULES_FILENAME],
+        "temp_pattern": r"[0-9A-F]{8}",
+    },
+}
+
+
+class Rules:
+    """Compiled form of the rules file: lookup tables and matchers built
+    once at load time, so nothing is parsed on the event path."""
+
+    def __init__(self, config=None):
+        config = dict(DEFAULT_RULES, **(config or {}))
+        self.category_prefix = dict(config["category_prefix"])
+        self.default_prefix = config["default_prefix"]
+        self.year_folder_pattern = re.compile(f"^(?:{config['year_folder_pattern']})$")
+        self.workbook_name = config["workbook_name"]
+        self.workbook_pattern = re.compile(
+            "^" + re.escape(self.workbook_name).replace(re.escape("{year}"), r"(\d{2})") + "$"
+        )
+        ignore = dict(DEFAULT_RULES["ignore"], **config.get("ignore", {}))
+        self._ignore_prefixes = tuple(p.lower() for p in ignore["prefixes"])
+        self._ignore_suffixes = tuple(s.lower() for s in ignore["suffixes"])
+        self._ignore_names = frozenset(n.lower() for n in ignore["names"])
+        temp_pattern = ignore["temp_pattern"]
+        self._temp_pattern = re.compile(f"^(?:{temp_pattern})$") if temp_pattern else None
+
+    def prefix_for(self, category_label):
+        return self.category_prefix.get(category_label, self.default_prefix)
+
+    def is_temp_name(self, filename):
+        """True for the scratch names Excel renames through while saving."""
+        return self._temp_pattern is not None and self._temp_pattern.match(filename) is not None
+
+    def is_ignored(self, filename):
+        name = filename.lower()
+        return (
+            name in self._ignore_names
+            or name.startswith(self._ignore_prefixes)
+            or name.endswith(self._ignore_suffixes)
+            or self.is_temp_name(filename)
+            or self.workbook_pattern.match(filename) is not None
+        )
+
+
+class RulesFile:
+    """Rules loaded from a JSON file and reloaded when its mtime changes.
+
+    ``current()`` returns the compiled ``Rules``; it stats the file at most
+    once per ``check_interval`` seconds. A file that fails to parse is
+    reported and the previous rules stay in effect.
+    """
+
+    def __init__(self, path, check_interval=CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._rules = Rules()
+        self._mtime = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._reload()
+
+    def current(self):
+        if time.monotonic() >= self._next_check:
+            self._reload()
+        return self._rules
+
+    def _reload(self):
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime == self._mtime:
+                return
+            self._mtime = mtime
+            if mtime is None:
+                self._rules = Rules()
+                return
+            try:
+                with open(self.path, "r", encoding="utf-8-sig") as f:
+                    self._rules = Rules(json.load(f))
+                print(f"已加载规则文件: {self.path}")
+            except Exception as e:
+                print(f"规则文件无效，继续使用之前的规则: {self.path}: {e}")
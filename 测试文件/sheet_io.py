@@ -0,0 +1,144 @@
+class SheetSnapshot:
+    """Values of a worksheet's UsedRange, read with a single bulk COM call.
+
+    Coordinates are absolute 1-based (row, column) like ``ws.Cells``; cells
+    outside the used range read as empty.
+    """
+
+    def __init__(self, values, first_row=1, first_col=1):
+        self.rows = [list(row) for row in values]
+        self.first_row = first_row
+        self.first_col = first_col
+
+    @classmethod
+    def read(cls, ws):
+        used = ws.UsedRange
+        values = used.Value
+        if not isinstance(values, (tuple, list)):
+            # 单个单元格时 COM 返回标量而不是二维数组
+            values = ((values,),)
+        return cls(values, used.Row, used.Column)
+
+    @classmethod
+    def read_block(cls, ws, rows, cols):
+        # 从 A1 起读取 rows x cols 的区域，一次 COM 调用（如查找表头）
+        values = ws.Range(ws.Cells(1, 1), ws.Cells(rows, cols)).Value
+        if not isinstance(values, (tuple, list)):
+            values = ((values,),)
+        return cls(values, 1, 1)
+
+    @classmethod
+    def of(cls, ws):
+        # 已经是快照时直接复用，否则读取一次 UsedRange
+        if isinstance(ws, cls):
+            return ws
+        return cls.read(ws)
+
+    @property
+    def last_row(self):
+        return self.first_row + len(self.rows) - 1
+
+    @property
+    def last_col(self):
+        if not self.rows:
+            return self.first_col - 1
+        return self.first_col + len(self.rows[0]) - 1
+
+    def value(self, r, c):
+        i = r - self.first_row
+        j = c - self.first_col
+        if i < 0 or j < 0 or i >= len(self.rows):
+            return None
+        row = self.rows[i]
+        if j >= len(row):
+            return None
+        return row[j]
+
+    def text(self, r, c):
+        return str(self.value(r, c) or "").strip()
+
+    def set(self, r, c, value):
+        # 写入工作表后同步快照，使同一会话中的后续查找看到新值
+        if r < self.first_row:
+            self.rows[0:0] = [[] for _ in range(self.first_row - r)]
+            self.first_row = r
+        if c < self.first_col:
+            pad = [None] * (self.first_col - c)
+            self.rows = [pad + row for row in self.rows]
+            self.first_col = c
+        i = r - self.first_row
+        j = c - self.first_col
+        while len(self.rows) <= i:
+            self.rows.append([])
+        row = self.rows[i]
+        if len(row) <= j:
+            row.extend([None] * (j + 1 - len(row)))
+        row[j] = value
+
+
+class RowWriter:
+    """Writes whole catalog records with one ``Range.Value`` assignment.
+
+    A record is a dict of header name -> value; headers missing from the
+    header map are ignored. ``write_rows`` writes records for consecutive
+    rows in one call per contiguous block of columns (normally just one).
+    """
+
+    def __init__(self, ws, hm, snapshot=None):
+        self.ws = ws
+        self.hm = hm
+        self.snapshot = snapshot
+
+    def write(self, row, record):
+        self.write_rows(row, [record])
+
+    def write_rows(self, first_row, records):
+        if not records:
+            return
+        cols = sorted({self.hm[k] for rec in records for k in rec if k in self.hm})
+        if not cols:
+            return
+        by_col = [{self.hm[k]: v for k, v in rec.items() if k in self.hm} for rec in records]
+        last_row = first_row + len(records) - 1
+        for c1, c2 in _column_blocks(cols):
+            values = []
+            for i, rec in enumerate(by_col):
+                values.append(tuple(self._value_for(rec, first_row + i, c) for c in range(c1, c2 + 1)))
+            target = self.ws.Range(self.ws.Cells(first_row, c1), self.ws.Cells(last_row, c2))
+            target.Value = tuple(values)
+            if self.snapshot is not None:
+                for i, row_values in enumerate(values):
+                    for j, v in enumerate(row_values):
+                        self.snapshot.set(first_row + i, c1 + j, v)
+
+    def link(self, row, header, address, text, replace=False):
+        cell = self.ws.Cells(row, self.hm[header])
+        if replace:
+            try:
+                cell.Hyperlinks.Delete()
+            except Exception:
+                pass
+        self.ws.Hyperlinks.Add(Anchor=cell, Address=address, TextToDisplay=text)
+        if self.snapshot is not None:
+            self.snapshot.set(row, self.hm[header], text)
+
+    def _value_for(self, rec, r, c):
+        if c in rec:
+            return rec[c]
+        # 同一批记录的列不一致时，缺失的列保留原值
+        if self.snapshot is not None:
+            return self.snapshot.value(r, c)
+        return self.ws.Cells(r, c).Value
+
+
+def _column_blocks(cols):
+    blocks = []
+    start = prev = cols[0]
+    for c in cols[1:]:
+        if c != prev + 1:
+            blocks.append((start, prev))
+            start = c
+        prev = c
+    blocks.append((start, prev))
+    return blocks
+
@@ -0,0 +1,357 @@
+import os
+import re
+import threading
+
+from doc_no import normalize_doc_no
+
+
+def _loose_doc_no(v):
+    # 目录中的文号常带括号，如“（经开便函〔2025〕10 号）”
+    return re.sub(r"[\s（）()]+", "", str(v or ""))
+
+
+def _path_key(address):
+    # 超链接地址可能用 \ 或 /，Windows 上不区分大小写
+    return os.path.normcase(address).replace("\\", "/")
+
+
+def _stat_token(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class RowIndex:
+    """Hash lookup of existing catalog rows.
+
+    Maps the normalized 文号 and the 文件名 cell text (and its basename) to
+    row numbers, so duplicate detection is a dictionary lookup instead of a
+    scan over the whole sheet.
+    """
+
+    def __init__(self):
+        self._by_doc_no = {}
+        self._by_loose_doc_no = {}
+        self._by_file = {}
+        self._row_keys = {}
+        # 行 -> 文件名列超链接地址（相对路径）；按目录查找时才读取（见 load_paths）
+        self._paths = None
+
+    @classmethod
+    def build(cls, snapshot, header_row, hm):
+        index = cls()
+        doc_col = hm.get("文号")
+        file_col = hm.get("文件名")
+        for r in range(header_row + 1, snapshot.last_row + 1):
+            doc_no = snapshot.text(r, doc_col) if doc_col else ""
+            file_text = snapshot.text(r, file_col) if file_col else ""
+            if doc_no or file_text:
+                index.set_row(r, doc_no, file_text)
+        return index
+
+    def find(self, doc_no, rel_path, filename):
+        rows = []
+        doc_no = normalize_doc_no(doc_no)
+        if doc_no and doc_no in self._by_doc_no:
+            rows.append(self._by_doc_no[doc_no][0])
+        for key in (rel_path, filename):
+            key = (key or "").strip()
+            if key and key in self._by_file:
+                rows.append(self._by_file[key][0])
+        return min(rows) if rows else None
+
+    def contains(self, doc_no, rel_path, filename):
+        """Looser check used when reconciling a folder against the catalog:
+        also accepts the 文号 without brackets and 文件名 entered without
+        the file extension."""
+        if self.find(doc_no, rel_path, filename):
+            return True
+        loose = _loose_doc_no(doc_no)
+        if loose and loose in self._by_loose_doc_no:
+            return True
+        stem = os.path.splitext(filename or "")[0].strip()
+        return bool(stem) and stem in self._by_file
+
+    def set_row(self, row, doc_no, file_text):
+        self.remove_row(row)
+        keys = []
+        doc_no = normalize_doc_no(doc_no)
+        if doc_no:
+            keys.append((self._by_doc_no, doc_no))
+            if _loose_doc_no(doc_no):
+                keys.append((self._by_loose_doc_no, _loose_doc_no(doc_no)))
+        file_text = (file_text or "").strip()
+        if file_text:
+            keys.append((self._by_file, file_text))
+            base = os.path.basename(file_text.replace("\\", "/"))
+            if base and base != file_text:
+                keys.append((self._by_file, base))
+        for table, key in keys:
+            rows = table.setdefault(key, [])
+            rows.append(row)
+            rows.sort()
+        self._row_keys[row] = keys
+
+    @property
+    def has_paths(self):
+        return self._paths is not None
+
+    def load_paths(self, links):
+        """Record the (row, hyperlink address) pairs of the sheet; until
+        then ``set_path`` is a no-op and ``rows_under`` finds nothing."""
+        self._paths = {row: _path_key(address) for row, address in links if address}
+
+    def set_path(self, row, address):
+        if self._paths is not None:
+            self._paths[row] = _path_key(address)
+
+    def rows_under(self, directory):
+        # 超链接地址位于 directory（相对路径）之下的行
+        prefix = _path_key(directory).rstrip("/") + "/"
+        return sorted(row for row, path in (self._paths or {}).items() if path.startswith(prefix))
+
+    def remove_row(self, row):
+        for table, key in self._row_keys.pop(row, ()):
+            rows = table.get(key)
+            if rows and row in rows:
+                rows.remove(row)
+                if not rows:
+                    del table[key]
+
+
+class SelfIdCounters:
+    """Highest allocated 自编号 number per (prefix, year), e.g. SJW-2025-N.
+
+    Built with one pass over the 自编号 column; allocation then only
+    advances the counter.
+    """
+
+    _PATTERN = re.compile(r"^(.+?)-(\d{4})-(\d+)$")
+
+    def __init__(self):
+        self._max = {}
+
+    @classmethod
+    def build(cls, snapshot, header_row, self_col):
+        counters = cls()
+        if self_col:
+            for r in range(header_row + 1, snapshot.last_row + 1):
+                counters.observe(snapshot.text(r, self_col))
+        return counters
+
+    def observe(self, value):
+        m = self._PATTERN.match(str(value or "").strip())
+        if m:
+            key = (m.group(1), m.group(2))
+            self._max[key] = max(self._max.get(key, 0), int(m.group(3)))
+
+    def next(self, prefix, year_full):
+        return self.reserve(prefix, year_full, 1)[0]
+
+    def reserve(self, prefix, year_full, count):
+        key = (prefix, str(year_full))
+        start = self._max.get(key, 0) + 1
+        self._max[key] = start + count - 1 if count > 0 else start - 1
+        return [f"{prefix}-{year_full}-{n}" for n in range(start, start + count)]
+
+
+def _seq_number(text):
+    try:
+        return int(float(text))
+    except (TypeError, ValueError):
+        return None
+
+
+class RowAllocator:
+    """Hands out (row, 序号) pairs for new catalog records in O(1).
+
+    Built with one pass over the sheet: it records the empty rows inside the
+    table (gaps left by deleted records), the 序号 already present in each
+    gap and the nearest numeric 序号 above it. Allocation fills gaps
+    top-down, then appends after the last row, giving the same result as
+    scanning for the first empty row and walking up for the previous 序号.
+    """
+
+    CONTENT_HEADERS = ("收文日期", "文号", "文件名", "自编号")
+
+    def __init__(self, gaps, append_row, last_seq, fixed_row=None):
+        # gaps: [(row, 该行已有的序号文本, (上方最近数字序号所在行, 序号))]，按行号升序
+        self._gaps = gaps
+        self._next_gap = 0
+        self._append_row = append_row
+        self._last_seq = last_seq
+        self._fixed_row = fixed_row
+        # 已分配行中最后一个数字序号：(row, 序号)；分配按行号递增进行
+        self._allocated = None
+
+    @classmethod
+    def build(cls, snapshot, header_row, hm):
+        content_cols = [hm[k] for k in cls.CONTENT_HEADERS if k in hm]
+        if not content_cols:
+            # 与 _find_first_empty_row_com 一致：没有内容列时总是表头下一行
+            return cls([], header_row + 1, None, fixed_row=header_row + 1)
+        seq_col = hm.get("序号")
+        gaps = []
+        last_seq = None
+        for r in range(header_row + 1, snapshot.last_row + 1):
+            seq_text = snapshot.text(r, seq_col) if seq_col else ""
+            if not any(snapshot.text(r, c) for c in content_cols):
+                gaps.append((r, seq_text, last_seq))
+            n = _seq_number(seq_text) if seq_text else None
+            if n is not None:
+                last_seq = (r, n)
+        return cls(gaps, max(snapshot.last_row, header_row) + 1, last_seq)
+
+    def allocate(self):
+        return self.allocate_many(1)[0]
+
+    def allocate_many(self, count):
+        result = []
+        for _ in range(count):
+            if self._fixed_row is not None:
+                result.append((self._fixed_row, 1))
+                continue
+            if self._next_gap < len(self._gaps):
+                row, own_seq, above = self._gaps[self._next_gap]
+                self._next_gap += 1
+            else:
+                row, own_seq, above = self._append_row, "", self._last_seq
+                self._append_row += 1
+            if own_seq:
+                # 该行已有序号：沿用（不覆盖）
+                n = _seq_number(own_seq)
+                seq = own_seq if n is None else n
+            else:
+                # 上方最近的数字序号：建表时记下的，或本次之前分配的行（更靠下者优先）
+                if self._allocated is not None and (above is None or self._allocated[0] > above[0]):
+                    above = self._allocated
+                seq = above[1] + 1 if above is not None else 1
+            if isinstance(seq, int):
+                self._allocated = (row, seq)
+            result.append((row, seq))
+        return result
+
+
+class SheetState:
+    """Everything derived from one sheet's contents that survives between
+    sessions: the snapshot (kept in sync with our writes), the row index,
+    the row allocator and the 自编号 counters.
+    """
+
+    def __init__(self, snapshot, header_row, hm):
+        self.snapshot = snapshot
+        self.header_row = header_row
+        self.hm = hm
+        self.index = RowIndex.build(snapshot, header_row, hm)
+        self.rows = RowAllocator.build(snapshot, header_row, hm)
+        self.self_ids = SelfIdCounters.build(snapshot, header_row, hm.get("自编号"))
+
+
+class WorkbookStructure:
+    """Where things are in one workbook: category label -> (sheet index,
+    sheet name) and sheet name -> (header row, column map).
+
+    Kept across external edits of the workbook. Each use re-checks the few
+    facts it relies on (sheet count, the sheet's name at the cached index,
+    the 序号/文件名 header cells) and rebuilds only what no longer holds.
+    """
+
+    def __init__(self):
+        self.sheet_count = None
+        self._sheets = {}
+        self._headers = {}
+
+    def sheet_index(self, wb, category_label, resolve):
+        count = wb.Sheets.Count
+        if count != self.sheet_count:
+            # 增删了工作表
+            self.sheet_count = count
+            self._sheets = {}
+            self._headers = {}
+        cached = self._sheets.get(category_label)
+        if cached is not None:
+            index, name = cached
+            if index is None or wb.Sheets(index).Name == name:
+                return index
+            # 工作表被改名或调整了顺序
+            self._sheets = {}
+            self._headers = {}
+        index = resolve(wb, category_label)
+        self._sheets[category_label] = (index, wb.Sheets(index).Name if index else None)
+        return index
+
+    def sheet_name(self, category_label):
+        # 上次解析到的工作表名（未解析过或没有对应工作表时为 None），不访问工作簿
+        cached = self._sheets.get(category_label)
+        return cached[1] if cached else None
+
+    def header(self, sheet_name, snapshot, detect):
+        cached = self._headers.get(sheet_name)
+        if cached is not None:
+            header_row, hm = cached
+            if all(snapshot.text(header_row, hm[k]) == k for k in ("序号", "文件名")):
+                return header_row, hm
+        header_row, hm = detect(snapshot)
+        if hm:
+            self._headers[sheet_name] = (header_row, hm)
+        return header_row, hm
+
+
+class WorkbookStateCache:
+    """Per-workbook cache of SheetState, keyed by sheet name.
+
+    The workbook file's mtime/size is recorded after each of our own saves;
+    when it differs at the start of a session the workbook was edited
+    outside this process and all cached sheets are dropped. The
+    WorkbookStructure of each workbook validates itself and is kept.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._structures = {}
+        self._lock = threading.Lock()
+
+    def structure(self, excel_path):
+        key = os.path.normcase(os.path.abspath(excel_path))
+        with self._lock:
+            structure = self._structures.get(key)
+            if structure is None:
+                structure = self._structures[key] = WorkbookStructure()
+            return structure
+
+    def sheets(self, excel_path):
+        key = os.path.normcase(os.path.abspath(excel_path))
+        token = _stat_token(excel_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["token"] != token:
+                if entry is not None and entry["sheets"]:
+                    print(f"收文目录已被外部修改，重建索引: {os.path.basename(excel_path)}")
+                entry = {"token": token, "sheets": {}}
+                self._entries[key] = entry
+            return entry["sheets"]
+
+    def cached_sheets(self, excel_path):
+        """The cached sheets if the file is unchanged since our last save or
+        load, else None; never drops anything."""
+        key = os.path.normcase(os.path.abspath(excel_path))
+        token = _stat_token(excel_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["token"] != token:
+                return None
+            return entry["sheets"]
+
+    def mark_saved(self, excel_path):
+        key = os.path.normcase(os.path.abspath(excel_path))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["token"] = _stat_token(excel_path)
+
+    def invalidate(self, excel_path):
+        key = os.path.normcase(os.path.abspath(excel_path))
+        with self._lock:
+            self._entries.pop(key, None)
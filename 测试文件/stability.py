@@ -0,0 +1,210 @@
+import os
+import stat
+import threading
+import time
+
+# 文件大小与修改时间保持不变多久才认为写入完成（秒）
+STABLE_SECONDS = 1.0
+# 时间轮每格的时长（秒）与格数；一圈 = TICK_SECONDS * WHEEL_SLOTS，更远的到期时间跨圈存放
+TICK_SECONDS = 0.1
+WHEEL_SLOTS = 512
+
+
+def tree_signature(directory):
+    """((文件数, 总大小, 最新修改时间), 最新的文件)；目录树中还有文件在复制时会变化"""
+    count = size = newest = 0
+    newest_path = None
+    stack = [directory]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                count += 1
+                size += st.st_size
+                if st.st_mtime_ns > newest:
+                    newest, newest_path = st.st_mtime_ns, entry.path
+    return (count, size, newest), newest_path
+
+
+class StabilityScheduler:
+    """Holds new files back until they have stopped changing.
+
+    ``track(path, item)`` is all the observer thread does: a dictionary
+    insert under a lock, no I/O. A scheduler thread turns a timer wheel
+    and, when a file's slot comes up, stats it; the file is released with
+    ``release(item)`` once its size and mtime have not changed for
+    ``stable_seconds`` and it can be opened for reading (a file still being
+    copied on Windows cannot). A file whose mtime is already older than
+    that on the first check (a rename, a finished copy) goes out right
+    away. Files that disappear are passed to ``vanished(item)``.
+
+    A tracked directory stands for its whole tree: its signature is
+    ``tree_signature`` and it is released once no file in it has changed
+    for ``stable_seconds`` (an empty directory waits the full interval, in
+    case a copy is about to fill it).
+
+    Each in-flight file costs one wheel entry and one ``stat`` per check,
+    so thousands of large copies can be tracked at once.
+    """
+
+    def __init__(self, release, vanished=None, stable_seconds=STABLE_SECONDS,
+                 tick=TICK_SECONDS, slots=WHEEL_SLOTS):
+        self._release = release
+        self._vanished = vanished
+        self.stable_seconds = stable_seconds
+        self.tick = tick
+        self._slots = [[] for _ in range(slots)]
+        self._entries = {}  # key -> {"path", "items", "due", "sig", "since", "version"}
+        self._tick_no = 0
+        self._counts = {"tracked": 0, "released": 0, "vanished": 0, "checks": 0}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="StabilityScheduler", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def _schedule(self, key, entry, ticks):
+        # 调用方持有 self._lock；重新排期时旧格子里的记录按 due 不符跳过
+        entry["due"] = self._tick_no + max(1, ticks)
+        self._slots[entry["due"] % len(self._slots)].append(key)
+
+    def track(self, path, item):
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {"path": path, "items": [], "sig": None, "since": 0.0, "version": 0}
+            else:
+                # 新事件说明文件又变了：重新开始计时
+                entry["sig"] = None
+                entry["version"] += 1
+            entry["items"].append(item)
+            self._counts["tracked"] += 1
+            self._schedule(key, entry, 1)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._entries)
+
+    def counts(self):
+        with self._lock:
+            return dict(self._counts, pending=len(self._entries))
+
+    def wait_idle(self, timeout=None):
+        """等到没有跟踪中的文件；超时返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending_count():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.tick)
+        return True
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            next_tick += self.tick
+            delay = next_tick - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            with self._lock:
+                self._tick_no += 1
+                slot_index = self._tick_no % len(self._slots)
+                slot = self._slots[slot_index]
+                due, later = {}, {}
+                for key in slot:
+                    entry = self._entries.get(key)
+                    if entry is None or entry["due"] % len(self._slots) != slot_index:
+                        # 已完成或已改排到别的格子
+                        continue
+                    (due if entry["due"] == self._tick_no else later)[key] = None
+                self._slots[slot_index] = list(later)
+            if due:
+                self._check(list(due))
+
+    def _probe(self, path, entry, now):
+        """('vanished' | 'stable' | 'locked' | 'changing', 新签名)；在锁外调用"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return "vanished", None
+        except OSError:
+            return "changing", None
+        if stat.S_ISDIR(st.st_mode):
+            sig, newest_path = tree_signature(path)
+            mtime = sig[2] / 1e9 if sig[0] else time.time()
+        else:
+            sig, newest_path, mtime = (st.st_size, st.st_mtime_ns), path, st.st_mtime
+        if sig == entry["sig"]:
+            settled = now - entry["since"] >= self.stable_seconds
+        else:
+            settled = entry["sig"] is None and time.time() - mtime >= self.stable_seconds
+        if not settled:
+            return "changing", sig
+        if newest_path is None:
+            return "stable", sig
+        try:
+            with open(newest_path, "rb"):
+                pass
+        except OSError:
+            # 仍被复制程序独占（Windows 复制时大小可能一开始就是最终大小）
+            return "locked", sig
+        return "stable", sig
+
+    def _check(self, keys):
+        with self._lock:
+            entries = [(key, self._entries[key], self._entries[key]["version"]) for key in keys if key in self._entries]
+        results = []
+        for key, entry, version in entries:
+            results.append((key, entry, version, self._probe(entry["path"], entry, time.monotonic())))
+
+        released, vanished = [], []
+        with self._lock:
+            now = time.monotonic()
+            for key, entry, version, (state, sig) in results:
+                self._counts["checks"] += 1
+                if self._entries.get(key) is not entry or entry["version"] != version:
+                    # 检查期间又来了新事件，track 已重新排期
+                    continue
+                if state == "vanished":
+                    del self._entries[key]
+                    vanished.extend(entry["items"])
+                elif state == "stable":
+                    del self._entries[key]
+                    released.extend(entry["items"])
+                else:
+                    if sig != entry["sig"] or state == "locked":
+                        entry["sig"] = sig
+                        entry["since"] = now
+                    wait = self.stable_seconds - (now - entry["since"])
+                    self._schedule(key, entry, int(wait / self.tick + 0.999))
+            self._counts["released"] += len(released)
+            self._counts["vanished"] += len(vanished)
+
+        for item in released:
+            try:
+                self._release(item)
+            except Exception as e:
+                print(f"文件已稳定，但交给下一阶段失败: {e}")
+        if self._vanished is not None:
+            for item in vanished:
+                try:
+                    self._vanished(item)
+                except Exception as e:
+                    print(f"处理已消失的文件失败: {e}")
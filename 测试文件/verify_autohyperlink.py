@@ -3,19 +3,9 @@ import shutil
 import time
 from datetime import datetime
 
-import pythoncom
-import win32com.client
-
 import auto_hyperlink as ah
 
 
-def _open_excel():
-    app = win32com.client.DispatchEx("Excel.Application")
-    app.Visible = False
-    app.DisplayAlerts = False
-    return app
-
-
 def _sheet_and_headers(wb, category_label):
     sheet_index = ah._find_sheet_index_com(wb, category_label)
     if sheet_index is None:
@@ -45,8 +35,35 @@ def _first_row_with_hyperlink(ws, header_row, file_col):
     return None
 
 
+def _formula_cells(path):
+    from xls_backend import _read_formulas
+    with open(path, "rb") as f:
+        formulas, _ = _read_formulas(f.read())
+    return {(sheet, cell): bytes(record[4 + 6:4 + 14]) + bytes(record[4 + 20:])
+            for sheet, cells in formulas.items() for cell, (_, record) in cells.items()}
+
+
+def _check_formula_refused(base_dir):
+    # 引用其他工作表的公式无法原样保留：原生 .xls 后端应拒绝写入，而不是变成数值
+    import xlwt
+    from xls_backend import FormulaLossError, XlsWorkbook
+
+    path = os.path.join(base_dir, f"2026工区收文目录.formula.{int(time.time())}.tmp.xls")
+    book = xlwt.Workbook()
+    book.add_sheet("上级文电").write(0, 0, 1)
+    book.add_sheet("行政函").write(0, 0, xlwt.Formula("上级文电!A1+1"))
+    book.save(path)
+    try:
+        XlsWorkbook(path)
+    except FormulaLossError:
+        return
+    finally:
+        os.remove(path)
+    raise RuntimeError("含跨表公式的收文目录应拒绝用原生 .xls 后端写入")
+
+
 def main():
-    pythoncom.CoInitialize()
+    # 通过 auto_hyperlink 的工作簿后端读写（COM 或原生 .xls），无需 Excel 也能运行
     base_dir = os.path.dirname(os.path.abspath(__file__))
     src_xls = os.path.join(base_dir, "2026工区收文目录.xls")
     tmp_xls = os.path.join(base_dir, f"2026工区收文目录.verify.{int(time.time())}.tmp.xls")
@@ -61,33 +78,13 @@ def main():
 
     shutil.copy2(src_xls, tmp_xls)
 
-    app = None
-    wb = None
-    app2 = None
-    wb2 = None
-    try:
-        app = _open_excel()
-        wb = app.Workbooks.Open(tmp_xls, UpdateLinks=0, ReadOnly=False)
-        ws, header_row, hm = _sheet_and_headers(wb, "上级文")
-
-        file_col = hm["文件名"]
-        date_col = hm.get("收文日期")
-        widths_before = [ws.Columns(c).ColumnWidth for c in range(1, 9)]
-
-        wb.Close(SaveChanges=True)
-        wb = None
-        app.Quit()
-        app = None
-
-        for p in test_files:
-            with open(p, "wb") as f:
-                f.write(b"test")
-            ah._update_workbook(tmp_xls, p)
-
-        app2 = _open_excel()
-        wb2 = app2.Workbooks.Open(tmp_xls, UpdateLinks=0, ReadOnly=False)
-        ws2, header_row2, hm2 = _sheet_and_headers(wb2, "上级文")
+    def read_widths(wb):
+        ws, _, _ = _sheet_and_headers(wb, "上级文")
+        return [ws.Columns(c).ColumnWidth for c in range(1, 9)]
 
+    def check(wb):
+        ws2, header_row2, hm2 = _sheet_and_headers(wb, "上级文")
+        date_col = hm2.get("收文日期")
         today_dot = datetime.now().strftime("%Y.%m.%d")
         today_slash = datetime.now().strftime("%Y/%m/%d")
 
@@ -124,37 +121,33 @@ def main():
                 if date_value not in (today_dot, today_slash):
                     raise RuntimeError(f"日期写入异常: {date_value} (期望 {today_dot} 或 {today_slash})")
 
-        widths_after = [ws2.Columns(c).ColumnWidth for c in range(1, 9)]
+        return [ws2.Columns(c).ColumnWidth for c in range(1, 9)]
+
+    formulas_before = _formula_cells(tmp_xls) if ah._backend_name() == "xls" else None
+    try:
+        widths_before = ah._get_host().run(tmp_xls, read_widths)
+        ah._close_host()
+
+        for p in test_files:
+            with open(p, "wb") as f:
+                f.write(b"test")
+        ah._update_workbook_batch(tmp_xls, test_files)
+        ah._close_host()
+
+        # 重新从磁盘加载后检查
+        widths_after = ah._get_host().run(tmp_xls, check)
         if widths_before != widths_after:
             raise RuntimeError("列宽发生变化（疑似触发表格蜷缩）")
 
-        wb2.Close(SaveChanges=True)
-        wb2 = None
-        app2.Quit()
-        app2 = None
+        if formulas_before is not None:
+            # 原生 .xls 后端：表中已有的公式（如 =HYPERLINK(...)）保存后原样保留
+            if _formula_cells(tmp_xls) != formulas_before:
+                raise RuntimeError("保存后公式丢失或被改动")
+            _check_formula_refused(base_dir)
 
         print("检查通过：超链接未覆盖、格式未变、文件名正确、日期正确。")
     finally:
-        try:
-            if wb is not None:
-                wb.Close(SaveChanges=False)
-        except Exception:
-            pass
-        try:
-            if app is not None:
-                app.Quit()
-        except Exception:
-            pass
-        try:
-            if wb2 is not None:
-                wb2.Close(SaveChanges=False)
-        except Exception:
-            pass
-        try:
-            if app2 is not None:
-                app2.Quit()
-        except Exception:
-            pass
+        ah._close_host()
         try:
             for p in test_files:
                 if os.path.exists(p):
@@ -166,10 +159,6 @@ def main():
                 os.remove(tmp_xls)
         except Exception:
             pass
-        try:
-            pythoncom.CoUninitialize()
-        except Exception:
-            pass
 
 
 if __name__ == "__main__":
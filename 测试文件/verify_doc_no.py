@@ -0,0 +1,80 @@
+import argparse
+import glob
+import json
+import os
+import time
+
+import doc_no
+
+GOLDEN = "doc_no_golden.json"
+
+# 语料之外、需要特别保证的写法
+EDGE_CASES = {
+    "abc[2025]1号x〔2025〕2号.pdf": "abc[2025]1号x〔2025〕2号",
+    "x[2025]3号 y〔2025〕4号.doc": "y〔2025〕4号",
+    "（惠电段安发2025-4号）通知.pdf": "惠电段安发2025-4号",
+    "（经开便函〔2025〕10 号）关于.pdf": "经开便函〔2025〕10号",
+    "a【2025】 7 号 b.pdf": "a【2025】7号",
+    "关于2025年的通知（第3号）.pdf": "",
+    "普通文件名.docx": "",
+}
+
+
+def _real_filenames(base_dir):
+    paths = glob.glob(os.path.join(base_dir, "*", "25", "*")) + glob.glob(os.path.join(base_dir, "*", "26", "*"))
+    return sorted({os.path.basename(p) for p in paths if os.path.isfile(p)})
+
+
+def _throughput(fn, names, min_seconds=0.3):
+    runs = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds:
+        fn(names)
+        runs += 1
+    return runs * len(names) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文号提取：黄金语料正确性与吞吐量检查")
+    parser.add_argument("--update", action="store_true", help="用当前实现和当前目录下的文件名重写黄金语料（新增写法后使用，提交前请检查差异）")
+    args = parser.parse_args()
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    golden_path = os.path.join(base_dir, GOLDEN)
+
+    if args.update:
+        cases = [{"filename": n, "doc_no": doc_no.extract_doc_no(n)} for n in _real_filenames(base_dir)]
+        with open(golden_path, "w", encoding="utf-8") as f:
+            json.dump({"source": "测试文件/*/25 与 */26 下的真实文件名", "cases": cases}, f, ensure_ascii=False, indent=1)
+        print(f"已更新黄金语料: {len(cases)} 个文件名")
+        return
+
+    with open(golden_path, "r", encoding="utf-8") as f:
+        cases = json.load(f)["cases"]
+    expected = {c["filename"]: c["doc_no"] for c in cases}
+    expected.update(EDGE_CASES)
+    names = list(expected)
+
+    failures = [(n, expected[n], got) for n, got in zip(names, doc_no.extract_doc_nos(names)) if got != expected[n]]
+    for name, want, got in failures[:20]:
+        print(f"[FAIL] {name}: 期望 {want!r}，实际 {got!r}")
+    if failures:
+        raise RuntimeError(f"{len(failures)} / {len(names)} 个文件名的文号与黄金语料不一致")
+
+    def uncached(batch):
+        for n in batch:
+            doc_no._extract(os.path.splitext(n)[0])
+
+    def cached(batch):
+        for n in batch:
+            doc_no.extract_doc_no(n)
+
+    print(f"语料 {len(names)} 个文件名，其中 {sum(1 for v in expected.values() if v)} 个含文号")
+    print(f"未缓存: {_throughput(uncached, names):,.0f} 个/秒")
+    print(f"已缓存: {_throughput(cached, names):,.0f} 个/秒")
+    print(f"批量:   {_throughput(doc_no.extract_doc_nos, names):,.0f} 个/秒")
+    print("检查通过：文号提取结果与黄金语料一致。")
+
+
+if __name__ == "__main__":
+    main()
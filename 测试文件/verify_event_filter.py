@@ -0,0 +1,123 @@
+import contextlib
+import io
+import os
+import time
+
+from watchdog.events import FileCreatedEvent, FileDeletedEvent, FileMovedEvent
+
+import auto_hyperlink as ah
+from event_filter import EventFilter
+
+
+class _HoldingStability:
+    """只记录交给它的事件，不放行：模拟仍在等待写入完成的改名。"""
+
+    def __init__(self):
+        self.items = []
+
+    def track(self, path, item):
+        self.items.append(item)
+
+
+class _RecordingBatcher:
+    def __init__(self):
+        self.paths = []
+        self.deleted = []
+
+    def submit(self, key, event):
+        (self.deleted if event.kind == "deleted" else self.paths).append(event.path)
+
+
+def main():
+    # 真实路由表（1-上级文/25 -> 2025工区收文目录.xls），不写收文目录、不开事件日志
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    folder = os.path.join(base_dir, "1-上级文", "25")
+    a = os.path.join(folder, "（上级文〔2025〕801号）保存测试A.docx")
+    b = os.path.join(folder, "（上级文〔2025〕802号）复制测试B.pdf")
+
+    def p(name):
+        return os.path.join(folder, name)
+
+    batcher = _RecordingBatcher()
+    handler = ah.AutoHyperlinkHandler(batcher, EventFilter(ah._is_ignored_file, window=0.5))
+    events = [
+        # Word 保存：锁文件、临时文件、原文件改名为临时名、临时文件改回原名
+        FileCreatedEvent(p("~$保存测试A.docx")),
+        FileCreatedEvent(p("~WRD0000.tmp")),
+        FileMovedEvent(a, p("~WRL0001.tmp")),
+        FileMovedEvent(p("~WRD0000.tmp"), a),
+        FileDeletedEvent(p("~WRL0001.tmp")),
+        # 复制：同一最终路径先 created 再 moved
+        FileCreatedEvent(b),
+        FileMovedEvent(p("B.pdf.part"), b),
+        # 紧接着再保存一次 A：时间窗口内的重复
+        FileMovedEvent(p("~WRD0001.tmp"), a),
+        FileDeletedEvent(p("~$保存测试A.docx")),
+    ]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for event in events:
+            handler.dispatch(event)
+
+    # 1. 每个真实文件只进入批处理一次
+    if batcher.paths != [a, b]:
+        raise RuntimeError(f"应只放行 A、B 各一次，实际: {batcher.paths}")
+    counts = handler.filter.counts()
+    if counts != {"accepted": 2, "ignored": 3, "duplicate": 2, "covered": 0}:
+        raise RuntimeError(f"计数不符: {counts}")
+    print(f"Office 保存 + 复制: {len(events)} 个事件 -> {len(batcher.paths)} 个进入批处理，计数 {counts}")
+
+    # 2. 删除后重新创建、以及时间窗口之后的事件都会放行
+    with contextlib.redirect_stdout(io.StringIO()):
+        handler.dispatch(FileDeletedEvent(b))
+        handler.dispatch(FileCreatedEvent(b))
+        time.sleep(0.6)
+        handler.dispatch(FileMovedEvent(p("~WRD0002.tmp"), a))
+    if batcher.paths != [a, b, b, a] or batcher.deleted != [b]:
+        raise RuntimeError(f"删除后重建或窗口之后的事件应放行，实际: {batcher.paths} / 删除 {batcher.deleted}")
+
+    # 3. Excel 保存：新内容写到无扩展名的临时名，原文件改成另一个临时名，再改回原名并删除临时文件
+    x = p("（上级文〔2025〕803号）保存测试X.xlsx")
+    time.sleep(0.6)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for event in (
+            FileCreatedEvent(p("A1B2C3D4")),
+            FileMovedEvent(x, p("E5F6A7B8")),
+            FileMovedEvent(p("A1B2C3D4"), x),
+            FileDeletedEvent(p("E5F6A7B8")),
+        ):
+            handler.dispatch(event)
+    if batcher.paths[4:] != [x] or batcher.deleted != [b]:
+        raise RuntimeError(f"Excel 保存应只放行原文件一次、不登记删除，实际: {batcher.paths[4:]} / 删除 {batcher.deleted}")
+
+    # 3b. 只忽略 Excel 的临时名，其他没有扩展名的文件照常登记
+    plain = p("（上级文〔2025〕805号）说明")
+    with contextlib.redirect_stdout(io.StringIO()):
+        handler.dispatch(FileCreatedEvent(plain))
+    if batcher.paths[5:] != [plain]:
+        raise RuntimeError(f"没有扩展名的普通文件应登记，实际: {batcher.paths[5:]}")
+
+    # 4. 改名后随即删除新名字：改名仍在等待写入完成，登记为原文件被删除
+    stability = _HoldingStability()
+    held = ah.AutoHyperlinkHandler(_RecordingBatcher(), EventFilter(ah._is_ignored_file), stability)
+    original = p("（上级文〔2025〕804号）改名测试.pdf")
+    renamed = p("（上级文〔2025〕804号）改名测试.pdf.bak")
+    with contextlib.redirect_stdout(io.StringIO()):
+        held.dispatch(FileMovedEvent(original, renamed))
+        held.dispatch(FileDeletedEvent(renamed))
+    if len(stability.items) != 1 or held.batcher.deleted != [original]:
+        raise RuntimeError(f"改名后随即删除应登记原文件被删除: {held.batcher.deleted}")
+    held.vanished(stability.items[0])
+
+    # 5. 过滤本身的开销
+    f = EventFilter(ah._is_ignored_file)
+    names = [p(f"文件{i}.pdf") for i in range(20000)] * 5
+    start = time.perf_counter()
+    for name in names:
+        f.accept(name)
+    elapsed = time.perf_counter() - start
+    print(f"预过滤: {len(names) / elapsed:,.0f} 个事件/秒，计数 {f.counts()}")
+    print("检查通过：忽略规则与重复事件在进入工作簿处理之前被过滤。")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,40 @@
 import os
 import time
-import threading
-import win32com.client
-import pythoncom
-from auto_hyperlink import _update_workbook, _wait_for_file_unlock
+import xlrd
+import xlwt
+from auto_hyperlink import _update_workbook, _update_workbook_batch, _close_host
+from event_batcher import EventBatcher
 
 # Mock environment
 TEST_XLS = "2026工区收文目录.xls"
 TEST_FILE = "上级文/2026/测试通知.doc"
 
 def create_dummy_xls():
-    pythoncom.CoInitialize()
     if os.path.exists(TEST_XLS):
         try: os.remove(TEST_XLS)
         except: pass
     
-    app = win32com.client.Dispatch("Excel.Application")
-    app.Visible = False
-    app.DisplayAlerts = False
-    wb = app.Workbooks.Add()
-    ws = wb.Worksheets(1)
-    ws.Name = "上级文"
+    wb = xlwt.Workbook()
+    ws = wb.add_sheet("上级文")
     
     # Headers
     headers = ["序号", "收文日期", "文号", "文件名", "自编号", "传阅方式", "存盒位置", "备注"]
     for i, h in enumerate(headers):
-        ws.Cells(1, i+1).Value = h # Header at row 1
+        ws.write(0, i, h) # Header at row 1
         
-    wb.SaveAs(os.path.abspath(TEST_XLS), FileFormat=56) # xls
-    wb.Close()
-    app.Quit()
+    wb.save(os.path.abspath(TEST_XLS)) # xls
     
     # Verify creation
-    app = win32com.client.Dispatch("Excel.Application")
-    wb = app.Workbooks.Open(os.path.abspath(TEST_XLS))
-    ws = wb.Worksheets(1)
-    val = ws.Cells(1, 1).Value
+    val = xlrd.open_workbook(os.path.abspath(TEST_XLS)).sheet_by_index(0).cell_value(0, 0)
     print(f"Verified header at A1: {val}")
-    wb.Close(False)
-    app.Quit()
 
 def check_seq_is_1():
-    pythoncom.CoInitialize()
-    app = win32com.client.Dispatch("Excel.Application")
-    app.Visible = False
-    wb = app.Workbooks.Open(os.path.abspath(TEST_XLS))
-    ws = wb.Worksheets("上级文")
+    ws = xlrd.open_workbook(os.path.abspath(TEST_XLS)).sheet_by_name("上级文")
     
     # Data should be at row 2
-    seq = ws.Cells(2, 1).Value
+    seq = ws.cell_value(1, 0)
     print(f"Sequence at row 2 is: {seq}")
     
-    wb.Close(False)
-    app.Quit()
-    
     if int(seq) == 1:
         print("PASS: Sequence is 1")
     else:
@@ -61,6 +42,11 @@ def check_seq_is_1():
 
 def test_lock_mechanism():
     print("\nTesting lock mechanism (COM lock)...")
+    try:
+        import win32com.client
+    except ImportError:
+        print("SKIP: 需要 Excel (pywin32) 才能模拟文件被占用")
+        return
     # Lock the file using Excel
     app = win32com.client.Dispatch("Excel.Application")
     app.Visible = False
@@ -68,31 +54,33 @@ def test_lock_mechanism():
     wb = app.Workbooks.Open(os.path.abspath(TEST_XLS))
     print("File locked by Excel (Main thread).")
     
-    def run_update():
-        print("Thread: Attempting update...")
-        # Create a dummy file to trigger update logic
-        if not os.path.exists(os.path.dirname(TEST_FILE)):
-            os.makedirs(os.path.dirname(TEST_FILE))
-        with open(TEST_FILE, "w") as f: f.write("test")
-            
-        _update_workbook(os.path.abspath(TEST_XLS), os.path.abspath(TEST_FILE))
-        print("Thread: Update finished.")
+    # Create a dummy file to trigger update logic
+    if not os.path.exists(os.path.dirname(TEST_FILE)):
+        os.makedirs(os.path.dirname(TEST_FILE))
+    with open(TEST_FILE, "w") as f: f.write("test")
+
+    # 被锁定时不等待：批次被推迟，按退避重试，解锁后一次处理完
+    done = []
+    batcher = EventBatcher(lambda key, items: done.append(_update_workbook_batch(key, items)),
+                           quiet_seconds=0.1, defer_base=0.5)
+    batcher.submit(os.path.abspath(TEST_XLS), os.path.abspath(TEST_FILE))
+    time.sleep(2)
+    print(f"Main: deferred while locked: {batcher.deferred_keys()}")
 
-    t = threading.Thread(target=run_update)
-    t.start()
-    
-    time.sleep(4) # Wait longer than timeout (5s) to see if it gives up, or wait shorter to see if it retries?
-    # Wait 2 seconds, then close. _update_workbook timeout is 5s.
-    # It should retry for 2 seconds then succeed.
-    
     print("Main: Closing Excel...")
     wb.Close(SaveChanges=True)
     app.Quit()
     del wb
     del app
     print("Main: Excel closed.")
-    
-    t.join()
+
+    batcher.drain(timeout=30)
+    batcher.close()
+    _close_host()
+    if done:
+        print("PASS: update applied after the lock was released")
+    else:
+        print("FAIL: update was not applied")
     print("Lock test finished.")
 
 if __name__ == "__main__":
@@ -106,6 +94,7 @@ if __name__ == "__main__":
         with open(TEST_FILE, "w") as f: f.write("test")
             
         _update_workbook(os.path.abspath(TEST_XLS), os.path.abspath(TEST_FILE))
+        _close_host()
         
         check_seq_is_1()
         
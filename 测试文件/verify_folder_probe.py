@@ -0,0 +1,64 @@
+import os
+import threading
+import time
+
+from folder_probe import FakeProbe, FolderWatch
+
+# 测试用的轮询间隔（秒），比默认值短，整个检查几秒内完成
+MIN_INTERVAL = 0.02
+MAX_INTERVAL = 0.16
+FULL_SCAN_INTERVAL = 0.5
+
+
+def main():
+    # 假探测器：由测试打开/关闭文件夹，无需资源管理器，可在 Linux 上运行
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    other_dir = os.path.join(os.path.dirname(base_dir), "其他目录")
+    probe = FakeProbe()
+    watch = FolderWatch(probe, base_dir, MIN_INTERVAL, MAX_INTERVAL, FULL_SCAN_INTERVAL)
+    if watch.is_open:
+        raise RuntimeError("初始状态应为未打开")
+
+    # 1. 无变化时退避：1 秒内的检查次数远少于按最短间隔轮询
+    probe.signatures = probe.scans = 0
+    if watch.wait_for_change(timeout=1.0):
+        raise RuntimeError("无变化时不应返回打开")
+    if probe.signatures > 15:
+        raise RuntimeError(f"无变化时应逐步放慢轮询，1 秒内检查了 {probe.signatures} 次")
+    if probe.scans > 3:
+        raise RuntimeError(f"窗口数量不变时不应每次完整枚举，1 秒内枚举了 {probe.scans} 次")
+    print(f"空闲 1 秒：检查 {probe.signatures} 次，完整枚举 {probe.scans} 次")
+
+    # 2. 打开其他目录不唤醒；打开子目录视为打开，并在最长间隔内被发现
+    probe.open(other_dir)
+    if watch.wait_for_change(timeout=0.3):
+        raise RuntimeError("打开其他目录不应视为打开")
+    threading.Timer(0.1, probe.open, args=(os.path.join(base_dir, "1-上级文"),)).start()
+    start = time.monotonic()
+    if not watch.wait_for_change(timeout=5.0):
+        raise RuntimeError("打开子目录后应返回打开")
+    elapsed = time.monotonic() - start - 0.1
+    if elapsed > MAX_INTERVAL * 2:
+        raise RuntimeError(f"状态变化发现得太慢: {elapsed:.2f} 秒")
+    print(f"打开后 {elapsed * 1000:.0f} ms 被发现")
+
+    # 3. 关闭后在宽限期内重新打开：wait_for_change 返回打开（调用方不会停止子进程）
+    probe.close_folder(os.path.join(base_dir, "1-上级文"))
+    if watch.wait_for_change(timeout=5.0):
+        raise RuntimeError("关闭后应返回未打开")
+    threading.Timer(0.1, probe.open, args=(base_dir,)).start()
+    if not watch.wait_for_change(timeout=1.0):
+        raise RuntimeError("宽限期内重新打开应返回打开")
+
+    # 4. stop() 让等待中的线程立即返回
+    threading.Timer(0.1, watch.stop).start()
+    start = time.monotonic()
+    watch.wait_for_change()
+    if time.monotonic() - start > 1.0:
+        raise RuntimeError("stop() 后等待应立即返回")
+
+    print("检查通过：文件夹探测按需唤醒，空闲时退避。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import contextlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from watchdog.events import FileCreatedEvent
+
+import auto_hyperlink as ah
+from event_batcher import EventBatcher
+from event_filter import EventFilter
+from fake_excel import FakeWorkbookHost, make_catalog_workbook
+from metrics import BUCKETS, Metrics, MetricsWriter
+from stability import StabilityScheduler
+from xls_backend import XlsWorkbookHost
+
+TEMPLATE = "2026工区收文目录.verify.tmp.xls"
+OPS = 200000
+FILES = 50
+PIPELINE_STAGES = ("stability_wait", "batch_wait", "session", "read", "apply", "save", "event_to_saved", "file_to_saved")
+_PROM_LINE = re.compile(r'^[a-z_]+(\{[a-z]+="[^"]*"(,[a-z]+="[^"]*")*\})? -?[0-9.e+]+$')
+
+
+def _check_prometheus(text):
+    counts = {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            continue
+        if not _PROM_LINE.match(line):
+            raise RuntimeError(f"Prometheus 文本格式不符: {line}")
+        m = re.match(r'^autohyperlink_stage_seconds_bucket\{stage="([^"]+)",le="([^"]+)"\} (\d+)$', line)
+        if m:
+            counts.setdefault(m.group(1), []).append(int(m.group(3)))
+    for stage, cumulative in counts.items():
+        if cumulative != sorted(cumulative) or len(cumulative) != len(BUCKETS) + 1:
+            raise RuntimeError(f"直方图桶应累计递增: {stage} {cumulative}")
+    return counts
+
+
+def main():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    root = tempfile.mkdtemp(prefix="verify_metrics_")
+    try:
+        # 1. 开销：计数与记录一次耗时都只是一次加锁与几次加法
+        m = Metrics()
+        start = time.perf_counter()
+        for _ in range(OPS):
+            with m.timer("save"):
+                pass
+            m.inc("rows_written")
+        per_op = (time.perf_counter() - start) / OPS
+        if per_op > 20e-6:
+            raise RuntimeError(f"每次计时 + 计数 {per_op * 1e6:.1f} µs，开销过大")
+        print(f"开销: 计时 + 计数 {per_op * 1e6:.2f} µs/次")
+
+        # 2. 原生 .xls 后端：加载工作簿记入 open 阶段
+        excel_path = os.path.join(root, "2026工区收文目录.xls")
+        shutil.copy2(os.path.join(base_dir, TEMPLATE), excel_path)
+        m = Metrics()
+        XlsWorkbookHost(metrics=m).run(excel_path, lambda wb: None)
+        if m.snapshot()["stages"].get("open", {}).get("count") != 1:
+            raise RuntimeError("工作簿加载应记入 open 阶段")
+
+        # 3. 整条流水线（内存假后端）：各阶段耗时、计数与端到端时间
+        excel_path = os.path.join(root, "2025工区收文目录.xls")
+        open(excel_path, "wb").close()  # 路由表只看收文目录是否存在
+        host = FakeWorkbookHost()
+        host.add(make_catalog_workbook(excel_path, 1000))
+        folder = os.path.join(root, "1-上级文", "25")
+        os.makedirs(folder)
+        old_watch_dir = ah.WATCH_DIR
+        ah.WATCH_DIR, ah._ROUTES, ah._HOST, ah._METRICS = root, None, host, Metrics()
+        ah._STATE.invalidate(excel_path)
+        batcher = EventBatcher(ah._process_batch, quiet_seconds=0.1)
+        handler = None
+        stability = StabilityScheduler(
+            lambda item: handler.release(item), lambda item: handler.vanished(item), stable_seconds=0.2, tick=0.05
+        )
+        handler = ah.AutoHyperlinkHandler(batcher, EventFilter(ah._is_ignored_file), stability)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for i in range(FILES):
+                    path = os.path.join(folder, f"（上级文〔2025〕{7000 + i}号）指标测试{i}.pdf")
+                    open(path, "wb").close()
+                    handler.dispatch(FileCreatedEvent(path))
+                if not stability.wait_idle(timeout=20) or not batcher.drain(timeout=20):
+                    raise RuntimeError("20 秒内未处理完")
+            snapshot = ah._METRICS.snapshot()
+        finally:
+            stability.close()
+            batcher.close()
+            ah.WATCH_DIR, ah._ROUTES, ah._HOST = old_watch_dir, None, None
+            ah._STATE.invalidate(excel_path)
+        stages, counters = snapshot["stages"], snapshot["counters"]
+        missing = [s for s in PIPELINE_STAGES if s not in stages]
+        if missing:
+            raise RuntimeError(f"缺少阶段耗时: {missing}")
+        if counters.get("events_created") != FILES or counters.get("rows_written") != FILES:
+            raise RuntimeError(f"计数不符: {counters}")
+        if stages["file_to_saved"]["count"] != FILES or stages["file_to_saved"]["max"] > 10:
+            raise RuntimeError(f"文件落盘到保存的耗时不符: {stages['file_to_saved']}")
+        for stage in PIPELINE_STAGES:
+            h = stages[stage]
+            print(f"  {stage:<15} n={h['count']:<3} p50 ≤ {h['p50'] * 1000:.1f} ms  max {h['max'] * 1000:.1f} ms")
+
+        # 4. 写出：JSONL 按大小轮转、保留固定个数；Prometheus 文本可解析；指标文件被监控忽略
+        metrics_dir = os.path.join(root, "metrics")
+        os.makedirs(metrics_dir)
+        writer = MetricsWriter(ah._METRICS, metrics_dir, interval=3600, rotate_bytes=4096, keep=2)
+        ah._METRICS.gauge("batch_pending", lambda: 0)
+        for _ in range(20):
+            writer.write()
+        writer.close()
+        names = sorted(os.listdir(metrics_dir))
+        if names != [".autohyperlink_metrics.jsonl", ".autohyperlink_metrics.jsonl.1",
+                     ".autohyperlink_metrics.jsonl.2", ".autohyperlink_metrics.prom"]:
+            raise RuntimeError(f"轮转后的文件不符: {names}")
+        with open(writer.jsonl_path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        if records[-1]["gauges"] != {"batch_pending": 0} or "buckets" in records[-1]["stages"]["save"]:
+            raise RuntimeError(f"JSONL 记录不符: {records[-1]}")
+        with open(writer.prom_path, encoding="utf-8") as f:
+            _check_prometheus(f.read())
+        if not all(ah._is_ignored_file(name) for name in names):
+            raise RuntimeError("指标文件应被监控忽略")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print("检查通过：各阶段耗时与计数开销低，定期写出 JSONL（轮转）与 Prometheus 文本。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import contextlib
+import io
+import os
+import time
+
+import auto_hyperlink as ah
+from fake_excel import FakeWorkbookHost, make_catalog_workbook
+
+ROWS = 20000
+# make_catalog_workbook：第 1 行标题、第 2 行表头，第 i 条记录在第 i + 2 行
+DOC_COL, FILE_COL, NOTE_COL = 3, 4, 8
+
+
+def _apply(excel_path, *events):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return ah._update_workbook_events(excel_path, [ah.FileEvent(None, path, kind, src) for kind, path, src in events])
+
+
+def main():
+    # 内存假后端上的 2 万行收文目录，无需 Excel；路径按真实目录结构路由
+    base_dir = ah.WATCH_DIR
+    excel_path = os.path.join(base_dir, "2025工区收文目录.verify_rename.xls")
+    host = FakeWorkbookHost()
+    wb = host.add(make_catalog_workbook(excel_path, ROWS))
+    ws = wb.Worksheets("上级文电")
+    ah._HOST = host
+    ah._STATE.invalidate(excel_path)
+
+    def path(name, category="1-上级文"):
+        return os.path.join(base_dir, category, "25", name)
+
+    def existing(i):
+        return path(f"（测函〔2025〕{i}号）测试文件{i}.pdf")
+
+    try:
+        # 预热：第一次会话读取整张表并建立索引，之后的改名/删除只查索引
+        _apply(excel_path, ("deleted", path("不存在的文件.pdf"), None))
+        for sheet in wb.sheets:
+            sheet.calls = dict.fromkeys(sheet.calls, 0)
+
+        # 1. 改名：原行原地改写文件名与超链接
+        renamed = path("（测函〔2025〕500号）测试文件500-已改名.pdf")
+        start = time.perf_counter()
+        results = _apply(excel_path, ("moved", renamed, existing(500)))
+        elapsed = time.perf_counter() - start
+        if results != [("moved", renamed, 502)]:
+            raise RuntimeError(f"改名应改写原行 502: {results}")
+        link = ws.links[(502, FILE_COL)]
+        if ws.cells[(502, FILE_COL)] != os.path.basename(renamed) or link.Address != os.path.relpath(renamed, base_dir):
+            raise RuntimeError(f"文件名或超链接未更新: {ws.cells[(502, FILE_COL)]} / {link.Address}")
+        if ws.calls["Value.get"]:
+            raise RuntimeError(f"改名不应读取工作表: {ws.calls}")
+        print(f"改名: {ROWS} 行的表中 {elapsed * 1000:.2f} ms，工作表访问 {ws.calls}")
+
+        # 2. 改名后文号变化：文号一并改写；再按新名字改名也能找到
+        renumbered = path("（测函〔2025〕90001号）测试文件500-新文号.pdf")
+        if _apply(excel_path, ("moved", renumbered, renamed)) != [("moved", renumbered, 502)]:
+            raise RuntimeError("连续改名应仍改写同一行")
+        if ws.cells[(502, DOC_COL)] != "测函〔2025〕90001号":
+            raise RuntimeError(f"文号未更新: {ws.cells[(502, DOC_COL)]}")
+
+        # 3. 删除：备注标记；文件重新出现时清空备注，仍是同一行
+        if _apply(excel_path, ("deleted", existing(700), None)) != [("deleted", existing(700), 702)]:
+            raise RuntimeError("删除应标记原行 702")
+        if ws.cells.get((702, NOTE_COL)) != ah.DELETED_NOTE:
+            raise RuntimeError("删除后备注应为已删除")
+        if _apply(excel_path, ("created", existing(700), None)) != [("created", existing(700), 702)]:
+            raise RuntimeError("重新出现的文件应更新原行")
+        if ws.cells.get((702, NOTE_COL)):
+            raise RuntimeError("文件重新出现后备注应清空")
+
+        # 4. 移到另一分类：原表标记删除，新表登记
+        moved = path("（测函〔2025〕800号）测试文件800.pdf", "2-行政函")
+        results = _apply(excel_path, ("moved", moved, existing(800)))
+        if [r[0] for r in results] != ["deleted", "created"] or ws.cells.get((802, NOTE_COL)) != ah.DELETED_NOTE:
+            raise RuntimeError(f"跨分类移动应删除标记 + 新登记: {results}")
+
+        # 5. 原文件未登记：按新文件登记
+        results = _apply(excel_path, ("moved", path("（测函〔2025〕90002号）外部改名.pdf"), path("未登记.pdf")))
+        if [r[0] for r in results] != ["created"]:
+            raise RuntimeError(f"原文件未登记时应新增: {results}")
+        if wb.save_count != 6:
+            raise RuntimeError(f"每批应只保存一次，实际 {wb.save_count} 次")
+
+        # 6. 同一批中改名后新名字又被删除：经过 Excel 临时名的两者都作废，原行不动，不打开工作簿；
+        #    其他改名合并为删除原文件，原行标记删除
+        runs = host.runs
+        temp = path("E5F6A7B8")
+        if _apply(excel_path, ("moved", temp, existing(900)), ("deleted", temp, None)) != []:
+            raise RuntimeError("经过临时名的改名后随即删除应不改写任何行")
+        if host.runs != runs or ws.cells.get((902, FILE_COL)) != os.path.basename(existing(900)):
+            raise RuntimeError("经过临时名的改名后随即删除不应打开工作簿或改写原行")
+        bak = path("（测函〔2025〕900号）测试文件900.pdf.bak")
+        results = _apply(excel_path, ("moved", bak, existing(900)), ("deleted", bak, None))
+        if results != [("deleted", existing(900), 902)] or ws.cells.get((902, NOTE_COL)) != ah.DELETED_NOTE:
+            raise RuntimeError(f"改名后随即删除应标记原行 902: {results}")
+        if ws.cells.get((902, FILE_COL)) != os.path.basename(existing(900)):
+            raise RuntimeError("改名后随即删除不应改写原行文件名")
+
+        # 7. 删除目录：目录已不存在，按超链接地址找出其下登记过的行并标记删除
+        folder = os.path.join(base_dir, "1-上级文", "25", "目录删除测试")
+        names = [f"（测函〔2025〕{91000 + i}号）目录删除{i}.pdf" for i in range(3)]
+        added = _apply(excel_path, *[("created", os.path.join(folder, n), None) for n in names])
+        rows = [row for _, _, row in added]
+        ah._STATE.invalidate(excel_path)  # 重建索引：超链接地址须从工作表读回
+        results = _apply(excel_path, ("tree_deleted", folder, None))
+        if sorted(r[2] for r in results) != rows or any(ws.cells.get((r, NOTE_COL)) != ah.DELETED_NOTE for r in rows):
+            raise RuntimeError(f"删除目录应标记其下的行 {rows}: {results}")
+        if ws.cells.get((903, NOTE_COL)):
+            raise RuntimeError("删除目录不应影响目录外的行")
+    finally:
+        ah._HOST = None
+        ah._STATE.invalidate(excel_path)
+
+    print("检查通过：改名原地更新、删除标记备注，均通过索引定位。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from stability import StabilityScheduler
+
+STABLE_SECONDS = 0.5
+IN_FLIGHT = 5000
+
+
+def main():
+    root = tempfile.mkdtemp(prefix="verify_stability_")
+    released, vanished = {}, []
+    lock = threading.Lock()
+
+    def release(item):
+        with lock:
+            released[item] = time.monotonic()
+
+    scheduler = StabilityScheduler(release, vanished.append, stable_seconds=STABLE_SECONDS, tick=0.05)
+    try:
+        # 1. 持续写入中的文件（模拟网络复制大文件）：写完并稳定之后才放行
+        growing = os.path.join(root, "扫描件.pdf")
+        with open(growing, "wb") as f:
+            scheduler.track(growing, "growing")
+            for _ in range(10):
+                f.write(b"x" * 65536)
+                f.flush()
+                time.sleep(0.2)
+        finished = time.monotonic()
+        if "growing" in released:
+            raise RuntimeError("写入过程中不应放行")
+
+        # 2. 修改时间早于稳定时长的文件（改名、已完成的复制）第一次检查即放行
+        old = os.path.join(root, "旧文件.pdf")
+        open(old, "wb").close()
+        os.utime(old, (time.time() - 60, time.time() - 60))
+        tracked = time.monotonic()
+        scheduler.track(old, "old")
+
+        # 3. 等待期间消失的文件
+        gone = os.path.join(root, "临时.pdf")
+        open(gone, "wb").close()
+        scheduler.track(gone, "gone")
+        os.remove(gone)
+
+        if not scheduler.wait_idle(timeout=10):
+            raise RuntimeError("10 秒内未处理完")
+        if released["growing"] - finished > STABLE_SECONDS + 0.3:
+            raise RuntimeError(f"写完后放行太慢: {released['growing'] - finished:.2f} 秒")
+        if released["old"] - tracked > 0.3:
+            raise RuntimeError(f"旧文件应在第一次检查时放行: {released['old'] - tracked:.2f} 秒")
+        if vanished != ["gone"]:
+            raise RuntimeError(f"消失的文件应交给 vanished: {vanished}")
+        print(f"写完后 {(released['growing'] - finished) * 1000:.0f} ms 放行；旧文件 {(released['old'] - tracked) * 1000:.0f} ms 放行")
+
+        # 4. 大量同时在途的文件：track 不做 I/O，调度线程分批检查
+        paths = []
+        for i in range(IN_FLIGHT):
+            path = os.path.join(root, f"批量{i}.pdf")
+            open(path, "wb").close()
+            paths.append(path)
+        start = time.perf_counter()
+        for i, path in enumerate(paths):
+            scheduler.track(path, i)
+        per_track = (time.perf_counter() - start) / IN_FLIGHT
+        start = time.monotonic()
+        if not scheduler.wait_idle(timeout=30):
+            raise RuntimeError(f"30 秒内未处理完 {IN_FLIGHT} 个文件: {scheduler.counts()}")
+        if sum(1 for k in released if isinstance(k, int)) != IN_FLIGHT:
+            raise RuntimeError("有文件未放行")
+        print(f"{IN_FLIGHT} 个在途文件：track {per_track * 1e6:.1f} µs/个，"
+              f"{time.monotonic() - start:.2f} 秒全部放行，计数 {scheduler.counts()}")
+    finally:
+        scheduler.close()
+        shutil.rmtree(root, ignore_errors=True)
+
+    print("检查通过：文件稳定后才放行，且不阻塞事件线程。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import xlrd
+
+import auto_hyperlink as ah
+from folder_monitor import supervise
+from folder_probe import FakeProbe, FolderWatch
+
+TEMPLATE = "2026工区收文目录.verify.tmp.xls"
+WAIT_SECONDS = 20
+
+
+def _registered(excel_path, filename):
+    try:
+        book = xlrd.open_workbook(excel_path)
+    except Exception:
+        return False
+    for sheet in book.sheets():
+        if "上级文" not in sheet.name:
+            continue
+        for r in range(sheet.nrows):
+            if filename in (str(v) for v in sheet.row_values(r)):
+                return True
+    return False
+
+
+def _wait_for(condition, what):
+    deadline = time.monotonic() + WAIT_SECONDS
+    while not condition():
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{WAIT_SECONDS} 秒内未{what}")
+        time.sleep(0.05)
+
+
+def main():
+    # 假探测器 + 真实监控会话（原生 .xls 后端），在临时目录中运行，可在 Linux 上运行
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    root = tempfile.mkdtemp(prefix="verify_supervisor_")
+    excel_path = os.path.join(root, "2026工区收文目录.xls")
+    file_dir = os.path.join(root, "1-上级文", "26")
+    os.makedirs(file_dir)
+    shutil.copy2(os.path.join(base_dir, TEMPLATE), excel_path)
+
+    old_watch_dir = ah.WATCH_DIR
+    ah.WATCH_DIR = root
+    probe = FakeProbe()
+    watch = FolderWatch(probe, root, 0.02, 0.2, 0.5)
+    session = ah.WatchSession()
+    thread = None
+    try:
+        session.start(paused=True)
+        observer = session.observer
+        thread = threading.Thread(target=supervise, args=(session, watch), daemon=True)
+        thread.start()
+
+        # 1. 打开文件夹：恢复监控，新文件被登记
+        start = time.monotonic()
+        probe.open(root)
+        _wait_for(lambda: not session.paused, "恢复监控")
+        print(f"打开文件夹后 {(time.monotonic() - start) * 1000:.0f} ms 恢复监控")
+        name_a = "（上级文〔2026〕901号）常驻监控测试A.pdf"
+        open(os.path.join(file_dir, name_a), "wb").close()
+        _wait_for(lambda: _registered(excel_path, name_a), "登记打开期间新增的文件")
+
+        # 2. 关闭文件夹：排空后暂停，释放收文目录，观察者线程保留
+        probe.close_folder(root)
+        _wait_for(lambda: session.paused, "暂停监控")
+        if ah._HOST is not None:
+            raise RuntimeError("暂停后应释放收文目录")
+        if session.observer is not observer or not observer.is_alive():
+            raise RuntimeError("暂停不应停止或替换观察者")
+
+        # 3. 暂停期间新增的文件不处理；重新打开后补登
+        name_b = "（上级文〔2026〕902号）常驻监控测试B.pdf"
+        open(os.path.join(file_dir, name_b), "wb").close()
+        time.sleep(1.0)
+        if _registered(excel_path, name_b):
+            raise RuntimeError("暂停期间不应登记新文件")
+        start = time.monotonic()
+        probe.open(root)
+        _wait_for(lambda: _registered(excel_path, name_b), "补登暂停期间新增的文件")
+        print(f"重新打开后 {(time.monotonic() - start) * 1000:.0f} ms 补登完成")
+    finally:
+        watch.stop()
+        if thread is not None:
+            thread.join(timeout=5)
+        session.close()
+        probe.close()
+        ah.WATCH_DIR = old_watch_dir
+        shutil.rmtree(root, ignore_errors=True)
+
+    print("检查通过：监控常驻进程中，打开/关闭文件夹只恢复/暂停。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from watchdog.events import (
+    DirCreatedEvent, DirDeletedEvent, DirMovedEvent, FileCreatedEvent, FileDeletedEvent, FileMovedEvent,
+)
+
+import auto_hyperlink as ah
+from event_batcher import EventBatcher
+from event_filter import EventFilter
+from fake_excel import FakeWorkbookHost, make_catalog_workbook
+from stability import StabilityScheduler
+
+ROWS = 5000
+FILES = 300
+# make_catalog_workbook：第 1 行标题、第 2 行表头，第 i 条记录在第 i + 2 行
+FILE_COL, NOTE_COL = 4, 8
+
+
+def _rows_for(ws, names):
+    return {ws.cells.get((r, FILE_COL)): r for r in range(3, ws._max_row + 1) if ws.cells.get((r, FILE_COL)) in names}
+
+
+def main():
+    # 临时目录中的真实文件与路由表 + 内存假后端（无需 Excel）；事件按 watchdog 的顺序直接分派
+    root = tempfile.mkdtemp(prefix="verify_tree_")
+    excel_path = os.path.join(root, "2025工区收文目录.xls")
+    open(excel_path, "wb").close()  # 路由表只看收文目录是否存在
+    host = FakeWorkbookHost()
+    wb = host.add(make_catalog_workbook(excel_path, ROWS))
+    upper, admin = wb.Worksheets("上级文电"), wb.Worksheets("行政函")
+
+    old_watch_dir = ah.WATCH_DIR
+    ah.WATCH_DIR = root
+    ah._ROUTES = None
+    ah._HOST = host
+    ah._STATE.invalidate(excel_path)
+    batcher = EventBatcher(ah._process_batch, quiet_seconds=0.2)
+    event_filter = EventFilter(ah._is_ignored_file)
+    handler = None
+    stability = StabilityScheduler(
+        lambda item: handler.release(item), lambda item: handler.vanished(item), stable_seconds=0.3, tick=0.05
+    )
+    handler = ah.AutoHyperlinkHandler(batcher, event_filter, stability)
+    names = [f"（上级文〔2025〕{9000 + i}号）目录测试{i}.pdf" for i in range(FILES)]
+
+    def settle():
+        if not stability.wait_idle(timeout=20) or not batcher.drain(timeout=20):
+            raise RuntimeError("20 秒内未处理完")
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            # 1. 拖入一个目录：目录事件之后 watchdog 为每个文件补发 created，复制期间陆续到达
+            tree = os.path.join(root, "1-上级文", "25", "三月")
+            os.makedirs(tree)
+            handler.dispatch(DirCreatedEvent(os.path.join(root, "1-上级文")))
+            for i, name in enumerate(names):
+                path = os.path.join(tree, name)
+                open(path, "wb").close()
+                handler.dispatch(FileCreatedEvent(path))
+                if i % 100 == 0:
+                    time.sleep(0.1)
+            settle()
+        rows = _rows_for(upper, set(names))
+        if len(rows) != FILES:
+            raise RuntimeError(f"新目录中的文件应全部登记: {len(rows)}/{FILES}")
+        if host.runs != 1 or wb.save_count != 1:
+            raise RuntimeError(f"新目录应一次会话、一次保存: 会话 {host.runs}，保存 {wb.save_count}")
+        if event_filter.counts()["covered"] != FILES:
+            raise RuntimeError(f"逐个文件的事件应随目录丢弃: {event_filter.counts()}")
+        print(f"新目录 {FILES} 个文件：1 次会话、1 次保存")
+
+        # 2. 目录改名：watchdog 随后为每个文件补发 moved；只改写超链接地址，不读工作表
+        for sheet in wb.sheets:
+            sheet.calls = dict.fromkeys(sheet.calls, 0)
+        renamed = os.path.join(root, "1-上级文", "25", "2025年3月")
+        os.rename(tree, renamed)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            handler.dispatch(DirMovedEvent(tree, renamed))
+            for name in names:
+                handler.dispatch(FileMovedEvent(os.path.join(tree, name), os.path.join(renamed, name)))
+            settle()
+        elapsed = time.perf_counter() - start
+        prefix = os.path.relpath(renamed, root) + os.sep
+        stale = [r for r in rows.values() if not upper.links[(r, FILE_COL)].Address.startswith(prefix)]
+        if stale:
+            raise RuntimeError(f"超链接地址未改写: {len(stale)} 行")
+        if _rows_for(upper, set(names)) != rows:
+            raise RuntimeError("目录改名应原地改写原行")
+        if host.runs != 2 or wb.save_count != 2:
+            raise RuntimeError(f"目录改名应一次会话、一次保存: 会话 {host.runs}，保存 {wb.save_count}")
+        if upper.calls["Value.get"] or upper.calls["Value.set"]:
+            raise RuntimeError(f"目录改名不应读写单元格值: {upper.calls}")
+        print(f"目录改名 {FILES} 个文件：{elapsed * 1000:.0f} ms（含 0.2 秒静默期），工作表访问 {upper.calls}")
+
+        # 3. 目录移到另一分类：原表标记删除，新表成批登记
+        moved = os.path.join(root, "2-行政函", "25", "2025年3月")
+        os.makedirs(os.path.dirname(moved))
+        os.rename(renamed, moved)
+        with contextlib.redirect_stdout(io.StringIO()):
+            handler.dispatch(DirMovedEvent(renamed, moved))
+            settle()
+        if any(upper.cells.get((r, NOTE_COL)) != ah.DELETED_NOTE for r in rows.values()):
+            raise RuntimeError("移到另一分类后原表应标记删除")
+        admin_rows = _rows_for(admin, set(names))
+        if len(admin_rows) != FILES or wb.save_count != 3:
+            raise RuntimeError(f"移到另一分类后新表应一次登记: 保存 {wb.save_count}")
+
+        # 4. 删除目录：目录下登记过的行按超链接地址找出，一次会话全部标记删除
+        shutil.rmtree(moved)
+        with contextlib.redirect_stdout(io.StringIO()):
+            handler.dispatch(DirDeletedEvent(moved))
+            settle()
+        if any(admin.cells.get((r, NOTE_COL)) != ah.DELETED_NOTE for r in admin_rows.values()):
+            raise RuntimeError("删除目录后其下的行应标记删除")
+        if host.runs != 4 or wb.save_count != 4:
+            raise RuntimeError(f"删除目录应一次会话、一次保存: 会话 {host.runs}，保存 {wb.save_count}")
+
+        # 5. Windows 上删除目录收到的是 FileDeletedEvent：路由表中已知的目录同样整体标记删除
+        april = os.path.join(root, "1-上级文", "25", "四月")
+        april_names = [f"（上级文〔2025〕{9500 + i}号）四月{i}.pdf" for i in range(5)]
+        os.makedirs(april)
+        for name in april_names:
+            open(os.path.join(april, name), "wb").close()
+        with contextlib.redirect_stdout(io.StringIO()):
+            handler.dispatch(DirCreatedEvent(april))
+            settle()
+        april_rows = _rows_for(upper, set(april_names))
+        if len(april_rows) != len(april_names):
+            raise RuntimeError(f"四月目录中的文件应全部登记: {april_rows}")
+        shutil.rmtree(april)
+        with contextlib.redirect_stdout(io.StringIO()):
+            handler.dispatch(FileDeletedEvent(april))
+            settle()
+        if any(upper.cells.get((r, NOTE_COL)) != ah.DELETED_NOTE for r in april_rows.values()):
+            raise RuntimeError("以 FileDeletedEvent 报告的目录删除也应标记其下的行")
+    finally:
+        stability.close()
+        batcher.close()
+        ah._HOST = None
+        ah._STATE.invalidate(excel_path)
+        ah.WATCH_DIR = old_watch_dir
+        ah._ROUTES = None
+        shutil.rmtree(root, ignore_errors=True)
+
+    print("检查通过：新目录整体登记、目录移动改写超链接、删除目录标记删除，均在一次工作簿会话中完成。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import os
+
+from fake_excel import CountingExcelFactory
+from workbook_host import ExcelWorkbookHost
+
+
+def main():
+    factory = CountingExcelFactory()
+    host = ExcelWorkbookHost(app_factory=factory, max_operations=1000)
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    paths = [
+        os.path.join(base_dir, "2025工区收文目录.xls"),
+        os.path.join(base_dir, "2026工区收文目录.xls"),
+    ]
+    try:
+        for i in range(50):
+            host.run(paths[i % 2], lambda wb: wb.Save())
+    finally:
+        host.close()
+
+    print(f"launches={factory.launches} opens={factory.opens} saves={factory.saves} quits={factory.quits}")
+    if factory.launches != 1:
+        raise RuntimeError(f"一个监控会话应只启动一次 Excel，实际 {factory.launches} 次")
+    if factory.opens != len(paths):
+        raise RuntimeError(f"每个收文目录应只打开一次，实际 {factory.opens} 次")
+
+    factory = CountingExcelFactory()
+    host = ExcelWorkbookHost(app_factory=factory, max_operations=10)
+    try:
+        for i in range(25):
+            host.run(paths[0], lambda wb: wb.Save())
+        try:
+            host.run(paths[0], lambda wb: 1 / 0)
+        except ZeroDivisionError:
+            pass
+        host.run(paths[0], lambda wb: wb.Save())
+    finally:
+        host.close()
+    if factory.launches != 4:
+        raise RuntimeError(f"回收策略异常：期望 4 次启动，实际 {factory.launches} 次")
+
+    # 释放：保存并关闭收文目录与 Excel，下次操作重新打开
+    factory = CountingExcelFactory()
+    host = ExcelWorkbookHost(app_factory=factory)
+    try:
+        host.run(paths[0], lambda wb: None)
+        host.release(paths[0])
+        if host.is_open(paths[0]) or factory.quits != 1:
+            raise RuntimeError(f"release 后应关闭收文目录与 Excel: quits={factory.quits}")
+        host.run(paths[0], lambda wb: None)
+        if factory.opens != 2:
+            raise RuntimeError(f"release 后应重新打开，实际打开 {factory.opens} 次")
+    finally:
+        host.close()
+
+    print("检查通过：单次会话只启动一个 Excel，按操作数与异常回收，可立即释放收文目录。")
+
+
+if __name__ == "__main__":
+    main()
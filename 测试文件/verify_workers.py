@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+
+import auto_hyperlink as ah
+from event_batcher import EventBatcher
+from fake_excel import FakeWorkbookHost, make_catalog_workbook
+from workbook_host import HostPool
+
+# 每个批次在假后端上额外耗时（秒），用来观察两个收文目录是否并行处理
+SLOW_SECONDS = 0.3
+FILES_PER_YEAR = 20
+
+
+def main():
+    # 假后端：每个收文目录一个 FakeWorkbookHost，无需 Excel，可在 Linux 上运行
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    paths = {
+        year: os.path.join(base_dir, f"20{year}工区收文目录.verify_workers.xls")
+        for year in ("25", "26")
+    }
+    workbooks = {}
+
+    def factory(excel_path):
+        host = FakeWorkbookHost()
+        year_full = "20" + next(y for y, p in paths.items() if p == excel_path)
+        workbooks[excel_path] = host.add(make_catalog_workbook(excel_path, 5, year_full=year_full))
+        return host
+
+    spans = []
+    lock = threading.Lock()
+
+    def apply(excel_path, entries):
+        start = time.time()
+        time.sleep(SLOW_SECONDS)
+        ah._update_workbook_batch(excel_path, [file_path for _, file_path in entries])
+        with lock:
+            spans.append((excel_path, start, time.time(), threading.current_thread().name))
+
+    ah._HOST = HostPool(factory)
+    batcher = EventBatcher(apply, quiet_seconds=0.05, max_batch=5)
+    try:
+        for i in range(FILES_PER_YEAR):
+            for year, excel_path in paths.items():
+                file_path = os.path.join(base_dir, "1-上级文", year, f"（测函〔20{year}〕{900 + i}号）并行测试{i}.pdf")
+                batcher.submit(excel_path, (None, file_path))
+        if not batcher.drain(timeout=60):
+            raise RuntimeError("批处理未在 60 秒内完成")
+        names = batcher.worker_names()
+    finally:
+        batcher.close()
+        ah._close_host()
+
+    # 1. 每个收文目录一个工作线程
+    if len(names) != len(paths):
+        raise RuntimeError(f"应为每个收文目录一个工作线程，实际: {names}")
+
+    # 2. 不同收文目录的批次在时间上重叠（并行）
+    a = [s for s in spans if s[0] == paths["25"]]
+    b = [s for s in spans if s[0] == paths["26"]]
+    overlap = any(x[1] < y[2] and y[1] < x[2] for x in a for y in b)
+    if not overlap:
+        raise RuntimeError("两个收文目录的批次没有并行处理")
+
+    # 3. 同一收文目录内保持提交顺序
+    for year, excel_path in paths.items():
+        ws = workbooks[excel_path].Worksheets("上级文电")
+        numbers = []
+        for r in range(3, ws.UsedRange.Rows.Count + 1):
+            doc_no = str(ws.Cells(r, 3).Value or "")
+            if doc_no.startswith("测函") and "〕9" in doc_no:
+                numbers.append(int(doc_no.split("〕")[1].rstrip("号")))
+        if numbers != sorted(numbers) or len(numbers) != FILES_PER_YEAR:
+            raise RuntimeError(f"20{year} 行顺序与提交顺序不一致: {numbers}")
+
+    # 4. 静默期与批量上限按收文目录计算：一个持续有事件的收文目录不拖住另一个
+    applied = {}
+    quiet = EventBatcher(lambda key, items: applied.setdefault(key, time.time()), quiet_seconds=0.3, max_batch=1000)
+    try:
+        start = time.time()
+        quiet.submit("quiet", 0)
+        while time.time() - start < 1.5:
+            quiet.submit("busy", 0)
+            time.sleep(0.05)
+        if not quiet.drain(timeout=10):
+            raise RuntimeError("批处理未在 10 秒内完成")
+    finally:
+        quiet.close()
+    if applied.get("quiet", float("inf")) - start > 1.0:
+        raise RuntimeError("持续有事件的收文目录拖住了另一个收文目录的批次")
+
+    elapsed = max(s[2] for s in spans) - min(s[1] for s in spans)
+    print(f"workers={names} batches={len(spans)} elapsed={elapsed:.2f}s")
+    print("检查通过：每个收文目录独立工作线程并行处理，且各自保持事件顺序。")
+
+
+if __name__ == "__main__":
+    main()
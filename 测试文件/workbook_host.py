@@ -0,0 +1,246 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import Metrics
+
+# 空闲多久后关闭 Excel 实例（秒），避免长期占用收文目录
+IDLE_TIMEOUT = 120
+# 同一个 Excel 实例最多处理多少次操作后重建，防止长时间运行后 COM 状态劣化
+MAX_OPERATIONS = 500
+
+
+def _norm_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _launch_excel():
+    import win32com.client
+    try:
+        app = win32com.client.DispatchEx("Excel.Application")
+    except Exception:
+        # Fallback to standard Dispatch if Ex fails
+        app = win32com.client.Dispatch("Excel.Application")
+    app.Visible = False
+    app.DisplayAlerts = False
+    return app
+
+
+class WorkbookHost:
+    """Keeps workbooks warm for the whole monitoring session.
+
+    All work runs through ``run(excel_path, fn)``; ``fn`` receives the open
+    workbook and is executed on the host's own thread.
+    """
+
+    def run(self, excel_path, fn):
+        raise NotImplementedError
+
+    def is_open(self, excel_path):
+        return False
+
+    def release(self, excel_path):
+        """Save and close ``excel_path`` now rather than when idle."""
+
+    def close(self):
+        pass
+
+
+class ExcelWorkbookHost(WorkbookHost):
+    """One long-lived Excel.Application with its open workbooks.
+
+    The host owns a dedicated thread (its COM apartment). Workbooks stay
+    open between operations; the application is shut down after
+    ``idle_timeout`` seconds without work, recycled after ``max_operations``
+    operations and recycled immediately when an operation raises.
+
+    ``app_factory`` replaces the real COM launch (e.g. with a counting fake
+    from ``fake_excel``); COM is only initialized when it is not given.
+    Excel launches and ``Workbooks.Open`` are timed into ``metrics``
+    (stages ``excel_start`` and ``open``).
+    """
+
+    def __init__(self, app_factory=None, idle_timeout=IDLE_TIMEOUT, max_operations=MAX_OPERATIONS,
+                 metrics=None):
+        self._app_factory = app_factory or _launch_excel
+        self._metrics = metrics or Metrics()
+        self._use_com = app_factory is None
+        self.idle_timeout = idle_timeout
+        self.max_operations = max_operations
+        self._app = None
+        self._workbooks = {}
+        self._operations = 0
+        self._last_used = time.time()
+        self._jobs = queue.Queue()
+        self._open_keys = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def run(self, excel_path, fn):
+        if self._closed:
+            raise RuntimeError("WorkbookHost 已关闭")
+        self._ensure_thread()
+        fut = Future()
+        self._jobs.put((excel_path, fn, fut))
+        return fut.result()
+
+    def is_open(self, excel_path):
+        with self._lock:
+            return _norm_key(excel_path) in self._open_keys
+
+    def release(self, excel_path):
+        if self._closed or not self.is_open(excel_path):
+            return
+        # 在宿主线程上执行，排在已提交的操作之后
+        fut = Future()
+        self._jobs.put((excel_path, None, fut))
+        fut.result()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._jobs.put(None)
+            self._thread.join()
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="WorkbookHost", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        if self._use_com:
+            try:
+                import pythoncom
+                pythoncom.CoInitialize()
+            except Exception:
+                pass
+        try:
+            while True:
+                try:
+                    job = self._jobs.get(timeout=1.0)
+                except queue.Empty:
+                    if self._app is not None and time.time() - self._last_used >= self.idle_timeout:
+                        print("Excel 空闲超时，释放收文目录")
+                        self._shutdown(save=True)
+                    continue
+                if job is None:
+                    break
+                excel_path, fn, fut = job
+                if fn is None:
+                    self._shutdown(save=True)
+                    fut.set_result(None)
+                    continue
+                try:
+                    fut.set_result(self._execute(excel_path, fn))
+                except BaseException as e:
+                    fut.set_exception(e)
+        finally:
+            self._shutdown(save=True)
+            if self._use_com:
+                try:
+                    import pythoncom
+                    pythoncom.CoUninitialize()
+                except Exception:
+                    pass
+
+    def _execute(self, excel_path, fn):
+        if self._operations >= self.max_operations:
+            self._shutdown(save=True)
+        try:
+            wb = self._workbook(excel_path)
+            result = fn(wb)
+        except Exception:
+            # COM 异常后实例状态不可信：丢弃未保存的修改并重建
+            self._shutdown(save=False)
+            raise
+        self._operations += 1
+        self._last_used = time.time()
+        return result
+
+    def _workbook(self, excel_path):
+        key = _norm_key(excel_path)
+        wb = self._workbooks.get(key)
+        if wb is not None:
+            try:
+                wb.Name
+                return wb
+            except Exception:
+                # 工作簿已被外部关闭或 Excel 已退出
+                self._shutdown(save=False)
+        if self._app is None:
+            with self._metrics.timer("excel_start"):
+                self._app = self._app_factory()
+            self._operations = 0
+        with self._metrics.timer("open"):
+            wb = self._app.Workbooks.Open(excel_path, UpdateLinks=0, ReadOnly=False)
+        self._workbooks[key] = wb
+        with self._lock:
+            self._open_keys.add(key)
+        return wb
+
+    def _shutdown(self, save):
+        for wb in self._workbooks.values():
+            try:
+                wb.Close(SaveChanges=save)
+            except Exception:
+                pass
+        self._workbooks = {}
+        with self._lock:
+            self._open_keys.clear()
+        if self._app is not None:
+            try:
+                self._app.Quit()
+            except Exception:
+                pass
+        self._app = None
+        self._operations = 0
+
+
+class HostPool(WorkbookHost):
+    """One WorkbookHost per workbook, created on first use by
+    ``factory(excel_path)``.
+
+    With ``ExcelWorkbookHost`` every catalog gets its own thread, COM
+    apartment and Excel instance, so work on different years never waits
+    on each other; work on the same workbook is still serialized by its
+    host.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def host_for(self, excel_path):
+        key = _norm_key(excel_path)
+        with self._lock:
+            host = self._hosts.get(key)
+            if host is None:
+                host = self._hosts[key] = self._factory(excel_path)
+            return host
+
+    def run(self, excel_path, fn):
+        return self.host_for(excel_path).run(excel_path, fn)
+
+    def is_open(self, excel_path):
+        with self._lock:
+            host = self._hosts.get(_norm_key(excel_path))
+        return host is not None and host.is_open(excel_path)
+
+    def release(self, excel_path):
+        with self._lock:
+            host = self._hosts.get(_norm_key(excel_path))
+        if host is not None:
+            host.release(excel_path)
+
+    def close(self):
+        with self._lock:
+            hosts, self._hosts = list(self._hosts.values()), {}
+        for host in hosts:
+            host.close()
@@ -0,0 +1,279 @@
+import os
+import struct
+import threading
+
+from memory_workbook import MemoryHyperlink, MemoryRange, MemoryWorkbook, MemoryWorksheet
+from metrics import Metrics
+from workbook_host import WorkbookHost, _norm_key
+
+_STDLINK_GUID = bytes.fromhex("D0C9EA79F9BACE118C8200AA004BA90B")
+_URL_MONIKER = bytes.fromhex("E0C9EA79F9BACE118C8200AA004BA90B")
+_FILE_MONIKER = bytes.fromhex("0303000000000000C000000000000046")
+
+
+def _stat_token(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _unicode_z(text):
+    # 以字符数（含结尾 NUL）为前缀的 UTF-16LE 字符串
+    return struct.pack("<I", len(text) + 1) + (text + "\0").encode("utf-16-le")
+
+
+def _hlink_record(row, col, link):
+    """BIFF8 HLINK record (0x01B8) for one cell; xlwt cannot write these."""
+    address = link.Address or ""
+    data = struct.pack("<HHHH", row, row, col, col) + _STDLINK_GUID + b"\x02\x00\x00\x00"
+    desc = _unicode_z(link.TextToDisplay or address)
+    if address and ("://" in address or address.lower().startswith("mailto:")):
+        moniker = _URL_MONIKER
+        url = (address + "\0").encode("utf-16-le")
+        moniker += struct.pack("<I", len(url)) + url
+        options = 0x17
+    elif address:
+        wide = address.encode("utf-16-le")
+        short = address.encode("gbk", errors="replace") + b"\0"
+        moniker = _FILE_MONIKER + struct.pack("<Hi", 0, len(short)) + short
+        moniker += b"\xff\xff\xad\xde" + b"\0" * 20
+        moniker += struct.pack("<i", 6 + len(wide)) + struct.pack("<i", len(wide)) + b"\x03\x00" + wide
+        options = 0x15 if not os.path.isabs(address) else 0x17
+    else:
+        moniker = b""
+        options = 0x14
+    data += struct.pack("<I", options | (0x08 if link.SubAddress else 0)) + desc + moniker
+    if link.SubAddress:
+        data += _unicode_z(link.SubAddress)
+    return struct.pack("<HH", 0x01B8, len(data)) + data
+
+
+class FormulaLossError(RuntimeError):
+    """The catalog contains formulas that cannot be carried over on save;
+    the xlutils copy would silently replace them with their last values."""
+
+
+# 公式记号（ptg）的长度；不在表中的（名称、跨表/外部引用、数组常量、共享与数组公式、扩展记号）
+# 引用了工作簿级的表或带附加数据，原样搬到新文件后会错位，这类公式不保留
+_PTG_SIZES = {0x1C: 2, 0x1D: 2, 0x1E: 3, 0x1F: 9, 0x21: 3, 0x22: 4, 0x24: 5, 0x25: 9, 0x27: 7,
+              0x28: 7, 0x29: 3, 0x2A: 5, 0x2B: 9, 0x2C: 5, 0x2D: 9}
+
+
+def _workbook_stream(data):
+    from xlrd.compdoc import CompDoc
+    doc = CompDoc(data)
+    return doc.get_named_stream("Workbook") or doc.get_named_stream("Book") or b""
+
+
+def _portable_formula(rgce):
+    """公式只引用本表单元格与常量时为 True（可原样写回）"""
+    pos = 0
+    try:
+        while pos < len(rgce):
+            ptg = rgce[pos]
+            if 0x03 <= ptg <= 0x16:
+                size = 1  # 运算符、括号、缺省参数
+            elif ptg == 0x17:
+                # ptgStr：字符数 + 是否双字节 + 字符
+                size = 3 + rgce[pos + 1] * (2 if rgce[pos + 2] & 0x01 else 1)
+            elif ptg == 0x19:
+                # ptgAttr；tAttrChoose 后面还有跳转表
+                size = 4
+                if rgce[pos + 1] & 0x04:
+                    size += 2 * (struct.unpack_from("<H", rgce, pos + 2)[0] + 1)
+            else:
+                size = _PTG_SIZES.get(ptg if ptg < 0x20 else (ptg & 0x1F) | 0x20)
+                if size is None:
+                    return False
+            pos += size
+    except IndexError:
+        return False
+    return pos == len(rgce)
+
+
+def _read_formulas(data):
+    """({工作表序号: {(rowx, colx): (xf, 原始记录)}}, [无法保留的 (工作表序号, rowx, colx)])
+
+    原始记录为 FORMULA 及其后的 STRING / CONTINUE（公式结果为文本时）。
+    """
+    mem = _workbook_stream(data)
+    sheet_at = {}  # 子流起始位置 -> 工作表序号（只数普通工作表，与 xlrd 一致）
+    formulas, unsupported = {}, []
+    pos, depth, sheet, last = 0, 0, None, None
+    while pos + 4 <= len(mem):
+        opcode, length = struct.unpack_from("<HH", mem, pos)
+        body = mem[pos + 4:pos + 4 + length]
+        if opcode == 0x0085 and depth == 1 and sheet is None and body[5] == 0x00:
+            sheet_at[struct.unpack_from("<I", body)[0]] = len(sheet_at)
+        elif opcode == 0x0809:
+            if depth == 0:
+                sheet = sheet_at.get(pos)
+            depth += 1
+        elif opcode == 0x000A:
+            depth -= 1
+        if opcode in (0x0207, 0x003C) and last is not None:
+            last[1] += mem[pos:pos + 4 + length]
+            pos += 4 + length
+            continue
+        last = None
+        if opcode == 0x0006 and depth == 1 and sheet is not None:
+            rowx, colx, xf, cce = struct.unpack_from("<HHH14xH", body)
+            if _portable_formula(body[22:22 + cce]):
+                last = [xf, bytearray(mem[pos:pos + 4 + length])]
+                formulas.setdefault(sheet, {})[(rowx, colx)] = last
+            else:
+                unsupported.append((sheet, rowx, colx))
+        pos += 4 + length
+    return formulas, unsupported
+
+
+class _RawCell:
+    # 原样写回的单元格记录（xlwt 的行按 get_biff_data() 输出）
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    def get_biff_data(self):
+        return self.data
+
+
+class XlsWorkbook(MemoryWorkbook):
+    """A BIFF .xls catalog loaded with xlrd and saved with xlwt.
+
+    Saving starts from a formatting-preserving copy of the original file
+    (styles, column widths, row heights, merged cells), rewrites only the
+    cells that changed using the style of the cell (or the row above it for
+    new rows), and re-emits every hyperlink as a native HLINK record.
+
+    The xlutils copy keeps values only, so formulas are carried over
+    separately: FORMULA records that only use constants and cells of their
+    own sheet (e.g. ``=HYPERLINK("...", "...")``) are written back verbatim
+    and recalculated by Excel on open. A catalog with any other formula
+    (names, other sheets, shared/array formulas) is refused with
+    ``FormulaLossError`` instead of losing it; use the COM backend for it.
+    Charts, images and data validation are not carried over.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._load()
+        for rsheet in self._book.sheets():
+            ws = MemoryWorksheet(rsheet.name)
+            for r in range(rsheet.nrows):
+                for c, cell in enumerate(rsheet.row(r)):
+                    ws.load_value(r + 1, c + 1, self._read_cell(cell))
+            for (r, c), h in rsheet.hyperlink_map.items():
+                ws.links[(r + 1, c + 1)] = MemoryHyperlink(
+                    h.url_or_path or "", h.desc or "", h.textmark or "", MemoryRange(ws, r + 1, c + 1, r + 1, c + 1)
+                )
+            for c, info in rsheet.colinfo_map.items():
+                ws.col_widths[c + 1] = info.width / 256.0
+            self.sheets.append(ws)
+
+    def _load(self):
+        import xlrd
+        from xlrd.formula import cellname
+        with open(self.FullName, "rb") as f:
+            data = f.read()
+        self._book = xlrd.open_workbook(file_contents=data, formatting_info=True)
+        self._formulas, unsupported = _read_formulas(data)
+        if unsupported:
+            names = self._book.sheet_names()
+            cells = "、".join(f"{names[i]}!{cellname(r, c)}" for i, r, c in unsupported[:5])
+            raise FormulaLossError(
+                f"收文目录中有无法保留的公式（{cells} 等 {len(unsupported)} 处），"
+                f"原生 .xls 后端保存会把它们变成数值，已拒绝写入；请安装 pywin32 使用 Excel 后端: {self.FullName}"
+            )
+
+    def _read_cell(self, cell):
+        import xlrd
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            try:
+                return xlrd.xldate_as_datetime(cell.value, self._book.datemode)
+            except Exception:
+                return cell.value
+        if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+            return None
+        return cell.value
+
+    def _save(self):
+        from xlutils.filter import XLRDReader, XLWTWriter, process
+        writer = XLWTWriter()
+        process(XLRDReader(self._book, self.Name), writer)
+        out = writer.output[0][1]
+        styles = writer.style_list
+        for idx, ws in enumerate(self.sheets):
+            rsheet = self._book.sheet_by_index(idx)
+            wsheet = out.get_sheet(idx)
+            for r, c in sorted(ws.dirty):
+                style = self._style_for(rsheet, styles, r - 1, c - 1)
+                value = ws.cells.get((r, c))
+                if style is None:
+                    wsheet.write(r - 1, c - 1, value)
+                else:
+                    wsheet.write(r - 1, c - 1, value, style)
+            for (rowx, colx), (xf, record) in self._formulas.get(idx, {}).items():
+                if (rowx + 1, colx + 1) in ws.dirty:
+                    # 本程序改写了该单元格：以新值为准
+                    continue
+                # 原样写回公式；格式索引换成新文件中的，并设置 fAlwaysCalc 让 Excel 打开时重算
+                record = bytearray(record)
+                struct.pack_into("<H", record, 8, out.add_style(styles[xf]))
+                record[18] |= 0x01
+                wsheet.row(rowx).insert_cell(colx, _RawCell(bytes(record)))
+            records = b"".join(_hlink_record(r - 1, c - 1, link) for (r, c), link in sorted(ws.links.items()))
+            if records:
+                panes_rec = wsheet._Worksheet__panes_rec
+                # HLINK 记录位于单元格与窗口设置之后、EOF 之前
+                wsheet._Worksheet__panes_rec = lambda panes_rec=panes_rec, records=records: panes_rec() + records
+        tmp_path = self.FullName + ".saving"
+        out.save(tmp_path)
+        os.replace(tmp_path, self.FullName)
+        self._load()
+
+    def _style_for(self, rsheet, styles, rowx, colx):
+        # 新增行沿用上方最近一行同列的格式
+        rowx = min(rowx, rsheet.nrows - 1)
+        while rowx >= 0:
+            if colx < rsheet.row_len(rowx):
+                return styles[rsheet.cell_xf_index(rowx, colx)]
+            rowx -= 1
+        return None
+
+
+class XlsWorkbookHost(WorkbookHost):
+    """Native backend: reads/writes the .xls directly, no Excel or COM.
+
+    Loaded workbooks stay in memory between operations and are reloaded
+    when the file changes on disk; a failed operation drops the copy.
+    Loads are timed into ``metrics`` as the ``open`` stage.
+    """
+
+    def __init__(self, metrics=None):
+        self._metrics = metrics or Metrics()
+        self._workbooks = {}
+        self._lock = threading.Lock()
+
+    def run(self, excel_path, fn):
+        key = _norm_key(excel_path)
+        with self._lock:
+            entry = self._workbooks.get(key)
+            token = _stat_token(excel_path)
+            if entry is None or entry[1] != token:
+                with self._metrics.timer("open"):
+                    entry = (XlsWorkbook(excel_path), token)
+            wb = entry[0]
+            try:
+                result = fn(wb)
+            except Exception:
+                self._workbooks.pop(key, None)
+                raise
+            self._workbooks[key] = (wb, _stat_token(excel_path))
+            return result
+
+    def close(self):
+        with self._lock:
+            self._workbooks = {}